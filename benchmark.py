@@ -0,0 +1,212 @@
+import json
+import os
+import sys
+import tempfile
+import time
+
+import gym
+import numpy as np
+
+from argparse import ArgumentParser
+from osmenv.catalog import load_catalog
+from osmenv.catalog import write_catalog
+from osmenv.esarsa import ExpectedSarsa
+from osmenv.presets import FULL_DEVIATION_FILES
+from osmenv.presets import FULL_ROUTE_FILES
+from osmenv.presets import OSM_FILE
+from osmenv.presets import ROUTER_TYPE
+from osmenv.presets import SCENARIOS
+from osmenv.presets import WEIGHTS
+from osmenv.qlearning import QLearning
+from osmenv.routing import OfflineRouter
+from osmenv.sarsa import Sarsa
+from osmenv.synthetic import GridNetwork
+from osmenv.synthetic import make_catalog
+
+ALGORITHMS = {
+    'q-learning': QLearning,
+    'sarsa': Sarsa,
+    'expected-sarsa': ExpectedSarsa
+}
+
+
+class BenchmarkWriter:
+
+    def __init__(self, file, context=None):
+
+        # results are written as one JSON object per line, each of them carries the context of the run
+        self._file = file
+        self._context = context if context is not None else dict()
+
+    def with_context(self, **context):
+        return BenchmarkWriter(self._file, dict(self._context, **context))
+
+    def write(self, benchmark, value, unit, **details):
+
+        record = dict(self._context, benchmark=benchmark, value=value, unit=unit, **details)
+
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+
+
+def measure(function, repeat=1):
+
+    # best of several runs, the first one may include warm up effects
+    durations = list()
+    for _ in range(max(repeat, 1)):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+
+    return min(durations)
+
+
+def benchmark_load(writer, osm_file, cache_dir):
+
+    # parsing the OSM file, building the graph cache and loading the graph cache
+    writer.write('osm_load', measure(lambda: OfflineRouter(osm_file, ROUTER_TYPE)), 's', cache='none')
+    writer.write('osm_load', measure(lambda: OfflineRouter(osm_file, ROUTER_TYPE, cache_dir)), 's', cache='cold')
+    writer.write('osm_load', measure(lambda: OfflineRouter(osm_file, ROUTER_TYPE, cache_dir), 3), 's', cache='warm')
+
+
+def benchmark_routing(writer, osm_file, cache_dir, num_queries, seed):
+
+    rng = np.random.default_rng(seed)
+
+    for engine in ['pyroutelib3', 'csr']:
+        router = OfflineRouter(osm_file, ROUTER_TYPE, cache_dir, engine=engine)
+        nodes = list(router._router.routing.keys())
+
+        # same random pairs of nodes for both engines
+        pairs = [(nodes[a], nodes[b]) for a, b in
+                 np.random.default_rng(seed).integers(0, len(nodes), (num_queries, 2)).tolist()]
+
+        found = list()
+        duration = measure(lambda: found.extend(router.find_route(a, b)[1] for a, b in pairs))
+
+        writer.write('find_route', duration / num_queries, 's/query', engine=engine, queries=num_queries,
+                     nodes=len(router._router.rnodes))
+
+    # lengths of the routes found, which are of realistic size
+    routes = [r for r in found if len(r) > 1] or [nodes[:2]]
+    duration = measure(lambda: [router.route_length(r) for r in routes], 3)
+
+    writer.write('route_length', duration / len(routes), 's/route', samples=len(routes),
+                 mean_nodes=float(np.mean([len(r) for r in routes])))
+
+    # snapping random coordinates to the closest nodes
+    coordinates = np.asarray(list(router._router.rnodes.values()))
+    points = coordinates[rng.integers(0, len(coordinates), num_queries)] + rng.normal(0, 1e-4, (num_queries, 2))
+
+    writer.write('snap', measure(lambda: router.snap(points), 3) / num_queries, 's/point', points=num_queries)
+
+
+def benchmark_environment(writer, osm_file, route_files, deviation_files, scenarios, cache_dir, num_steps,
+                          episodes, seed):
+
+    start = time.perf_counter()
+    env = gym.make('Environment', osm_file=osm_file, route_files=route_files, deviation_files=deviation_files,
+                   scenarios=scenarios, cache_dir=cache_dir, weights=WEIGHTS)
+    writer.write('env_init', time.perf_counter() - start, 's')
+
+    writer.write('env_set_weights', measure(lambda: env.set_weights(WEIGHTS)), 's')
+
+    # random actions in random states
+    env.seed(seed)
+    actions = np.random.default_rng(seed).integers(0, env.action_space.n, num_steps).tolist()
+
+    def run_steps():
+        env.reset()
+        for action in actions:
+            _, _, done, _ = env.step(action)
+            if done:
+                env.reset()
+
+    writer.write('env_step', num_steps / measure(run_steps, 3), 'steps/s', steps=num_steps)
+
+    # training throughput of each algorithm
+    for name, cls in ALGORITHMS.items():
+        for dense in [False, True]:
+            np.random.seed(seed)
+            env.seed(seed)
+
+            algorithm = cls(env, episodes, dense=dense)
+
+            start = time.perf_counter()
+            count = algorithm.fit(gamma=0.95, epsilon=0.5)
+            duration = time.perf_counter() - start
+
+            writer.write('fit', count / duration, 'episodes/s', algorithm=name, dense=dense, episodes=count)
+
+
+def run_bundled(writer, args, cache_dir):
+
+    writer = writer.with_context(network='bundled', routes=len(FULL_ROUTE_FILES),
+                                 deviations=len(FULL_DEVIATION_FILES), scenarios=len(SCENARIOS))
+
+    benchmark_load(writer, OSM_FILE, cache_dir)
+    benchmark_routing(writer, OSM_FILE, cache_dir, args.queries, args.seed)
+    benchmark_environment(writer, OSM_FILE, FULL_ROUTE_FILES, FULL_DEVIATION_FILES, SCENARIOS, cache_dir,
+                          args.steps, args.episodes, args.seed)
+
+
+def run_grid(writer, args, directory):
+
+    for size in args.sizes:
+
+        # write synthetic network of the current size
+        network = GridNetwork(size, size)
+        osm_file = os.path.join(directory, 'grid{0}.osm'.format(size))
+        network.write_osm(osm_file)
+
+        cache_dir = os.path.join(directory, 'cache')
+        size_writer = writer.with_context(network='grid', size=size, nodes=network.num_nodes,
+                                          edges=network.num_edges)
+
+        benchmark_load(size_writer, osm_file, cache_dir)
+        benchmark_routing(size_writer, osm_file, cache_dir, args.queries, args.seed)
+
+        # catalogs of different size on the same network
+        for num_routes in args.routes:
+            for num_deviations in args.deviations:
+                catalog = make_catalog(network, num_routes, num_deviations, args.scenarios, args.seed)
+                route_files, deviation_files, scenarios = load_catalog(write_catalog(
+                    os.path.join(directory, 'catalog{0}-{1}-{2}'.format(size, num_routes, num_deviations)), catalog))
+
+                benchmark_environment(size_writer.with_context(routes=num_routes, deviations=num_deviations,
+                                                               scenarios=len(scenarios)),
+                                      osm_file, route_files, deviation_files, scenarios, cache_dir,
+                                      args.steps, args.episodes, args.seed)
+
+
+if __name__ == '__main__':
+
+    # add options parser
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--network', dest='network', choices=['bundled', 'grid', 'all'], default='all')
+    parser.add_argument('-s', '--sizes', dest='sizes', nargs='+', type=int, default=[20, 50, 100])
+    parser.add_argument('-r', '--routes', dest='routes', nargs='+', type=int, default=[4, 16])
+    parser.add_argument('-d', '--deviations', dest='deviations', nargs='+', type=int, default=[8, 32])
+    parser.add_argument('-c', '--scenarios', dest='scenarios', type=int, default=8)
+    parser.add_argument('-q', '--queries', dest='queries', type=int, default=50)
+    parser.add_argument('-t', '--steps', dest='steps', type=int, default=10000)
+    parser.add_argument('-e', '--episodes', dest='episodes', type=int, default=1000)
+    parser.add_argument('--seed', dest='seed', type=int, default=0)
+    parser.add_argument('-o', '--output', dest='output', default=None)
+
+    args = parser.parse_args()
+
+    # results are written as JSON lines into a file or to stdout
+    output = open(args.output, 'a') if args.output is not None else sys.stdout
+    writer = BenchmarkWriter(output, {'timestamp': time.time()})
+
+    # all generated files and caches are temporary, thus each run starts from scratch
+    with tempfile.TemporaryDirectory() as directory:
+        if args.network in ('bundled', 'all'):
+            run_bundled(writer, args, os.path.join(directory, 'cache'))
+
+        if args.network in ('grid', 'all'):
+            run_grid(writer, args, directory)
+
+    if output is not sys.stdout:
+        output.close()
@@ -0,0 +1,37 @@
+import os
+import time
+
+from argparse import ArgumentParser
+from osmenv.bundle import Bundle
+from osmenv.presets import make_environment
+
+
+if __name__ == '__main__':
+
+    # add options parser
+    parser = ArgumentParser()
+    parser.add_argument('-f', '--full', dest='env_full', action='store_true')
+    parser.add_argument('-c', '--catalog', dest='catalog', default=None)
+    parser.add_argument('-o', '--output', dest='output', default='output/environment.bundle')
+
+    args = parser.parse_args()
+
+    # load environment from the OSM data once and compile everything it needs into one binary file
+    start = time.time()
+    env = make_environment(args.env_full, catalog=args.catalog)
+    end = time.time()
+
+    bundle = Bundle.from_environment(env)
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    bundle.save(args.output)
+
+    print('loaded environment in {0:.3f}s, compiled {1} routes, {2} deviations and {3} scenarios into {4}'.format(
+        end - start, len(bundle.routes), len(bundle.deviations), len(bundle.scenarios), args.output))
+
+    # loading the bundle requires neither the OSM data nor any route or deviation file
+    start = time.time()
+    make_environment(bundle=args.output)
+    end = time.time()
+
+    print('loaded environment from bundle in {0:.3f}s'.format(end - start))
@@ -0,0 +1,33 @@
+from argparse import ArgumentParser
+from osmenv.catalog import CatalogGenerator
+from osmenv.catalog import write_catalog
+from osmenv.presets import CACHE_DIR
+from osmenv.presets import OSM_FILE
+from osmenv.presets import ROUTER_TYPE
+from osmenv.routing import OfflineRouter
+
+
+if __name__ == '__main__':
+
+    # add options parser
+    parser = ArgumentParser()
+    parser.add_argument('-n', '--routes', dest='routes', type=int, default=1000)
+    parser.add_argument('-d', '--deviations', dest='deviations', type=int, default=3)
+    parser.add_argument('-c', '--scenarios', dest='scenarios', type=int, default=50)
+    parser.add_argument('-l', '--min-length', dest='min_length', type=float, default=2.0)
+    parser.add_argument('-m', '--max-length', dest='max_length', type=float, default=8.0)
+    parser.add_argument('-s', '--seed', dest='seed', type=int, default=0)
+    parser.add_argument('-i', '--input', dest='input', default=OSM_FILE)
+    parser.add_argument('-o', '--output', dest='output', default='output/catalog')
+
+    args = parser.parse_args()
+
+    # sample routes, deviations and scenarios on the routing network
+    router = OfflineRouter(args.input, ROUTER_TYPE, cache_dir=CACHE_DIR, engine='csr')
+    generator = CatalogGenerator(router, args.seed, args.min_length, args.max_length)
+
+    catalog = generator.generate(args.routes, args.deviations, args.scenarios)
+    filename = write_catalog(args.output, catalog)
+
+    print('generated {0} routes, {1} deviations and {2} scenarios, see {3}'.format(
+        len(catalog['routes']), len(catalog['deviations']), len(catalog['scenarios']), filename))
@@ -1,9 +1,19 @@
-import gym
-
 from argparse import ArgumentParser
+from functools import partial
 from osmenv.qlearning import QLearning
 from osmenv.sarsa import Sarsa
 from osmenv.esarsa import ExpectedSarsa
+from osmenv.hogwild import HogwildExpectedSarsa
+from osmenv.hogwild import HogwildQLearning
+from osmenv.hogwild import HogwildSarsa
+from osmenv.kernel import KernelExpectedSarsa
+from osmenv.kernel import KernelQLearning
+from osmenv.kernel import KernelSarsa
+from osmenv.kernel import NUMBA_AVAILABLE
+from osmenv.presets import make_environment
+from osmenv.profiling import Profiler
+from osmenv.storage import CHECKPOINT_EXTENSION
+from osmenv.storage import Q_TABLE_EXTENSION
 
 
 # add options parser
@@ -12,61 +22,54 @@ parser.add_argument('-q', '--q-learning', dest='run_q_learning', action='store_t
 parser.add_argument('-s', '--sarsa', dest='run_sarsa', action='store_true')
 parser.add_argument('-e', '--expected-sarsa', dest='run_esarsa', action='store_true')
 parser.add_argument('-f', '--full', dest='env_full', action='store_true')
+parser.add_argument('-c', '--catalog', dest='catalog', default=None)
+parser.add_argument('-u', '--bundle', dest='bundle', default=None)
+parser.add_argument('-b', '--binary', dest='binary', action='store_true')
+parser.add_argument('-k', '--kernel', dest='kernel', action='store_true')
+parser.add_argument('-w', '--workers', dest='workers', type=int, default=0)
+parser.add_argument('-t', '--checkpoint', dest='checkpoint', action='store_true')
+parser.add_argument('-p', '--profile', dest='profile', action='store_true')
+parser.add_argument('-m', '--metrics', dest='metrics', choices=['xlsx', 'csv', 'parquet'], default='xlsx')
 
 args = parser.parse_args()
 
+if args.checkpoint and (args.kernel or args.workers > 0):
+    parser.error('checkpoints are not supported by the kernel and worker modes')
+
+if args.kernel and args.workers > 0:
+    parser.error('the kernel and worker modes can\'t be combined')
+
+# without numba the kernel would run as plain Python, which is far slower than the regular algorithms
+if args.kernel and not NUMBA_AVAILABLE:
+    parser.error('the kernel mode requires numba, see preq.txt')
+
 # load simulation environment
-if args.env_full:
-    env = gym.make('Environment', osm_file='data/network.osm.pbf', route_files=[
-        'data/city2.json',
-        'data/land743.json',
-        'data/land744.json',
-        'data/village715.json'
-    ], deviation_files=[
-        'data/city2_dev1.json',
-        'data/city2_dev2.json',
-        'data/city2_dev3.json',
-        'data/city2_dev4.json',
-        'data/land743_dev1.json',
-        'data/land743_dev2.json',
-        'data/land744_dev1.json',
-        'data/land744_dev2.json',
-        'data/land744_dev3.json',
-        'data/village715_dev1.json',
-        'data/village715_dev2.json',
-        'data/village715_dev3.json',
-        'data/village715_dev4.json'
-    ], scenarios=[
-        1772,
-        23937,
-        10292
-    ])
+env = make_environment(args.env_full, catalog=args.catalog, bundle=args.bundle)
 
+# time training phases and environment calls if required
+profiler = Profiler() if args.profile else None
+
+if profiler is not None:
+    profiler.instrument_environment(env)
+
+# episodes run one after another, in the compiled kernel or in several worker processes sharing one q-table
+if args.workers > 0:
+    QLearningClass, SarsaClass, ExpectedSarsaClass = [partial(c, processes=args.workers) for c in
+                                                      (HogwildQLearning, HogwildSarsa, HogwildExpectedSarsa)]
+elif args.kernel:
+    QLearningClass, SarsaClass, ExpectedSarsaClass = KernelQLearning, KernelSarsa, KernelExpectedSarsa
 else:
-    env = gym.make('Environment', osm_file='data/network.osm.pbf', route_files=[
-        'data/city2.json',
-        'data/land743.json',
-        'data/land744.json'
-    ], deviation_files=[
-        'data/city2_dev1.json',
-        'data/city2_dev2.json',
-        'data/city2_dev3.json',
-        'data/city2_dev4.json',
-        'data/land743_dev1.json',
-        'data/land743_dev2.json',
-        'data/land744_dev1.json',
-        'data/land744_dev2.json',
-        'data/land744_dev3.json'
-    ], scenarios=[
-        1772,
-        23937,
-        10292
-    ])
-
-env.set_weights({
-    'length': 2,
-    'stops': 4
-})
+    QLearningClass, SarsaClass, ExpectedSarsaClass = QLearning, Sarsa, ExpectedSarsa
+
+
+def checkpoint_options(name):
+
+    # checkpoints are written next to the results, running the same command again continues from there
+    if args.checkpoint:
+        return {'checkpoint': 'output/' + name + CHECKPOINT_EXTENSION}
+    else:
+        return dict()
+
 
 # configure global hyper parameters
 episodes = 5000
@@ -74,14 +77,27 @@ episodes = 5000
 g = 0.95
 e = 0.5
 
+# q-tables are either stored as JSON or binary file
+extension = Q_TABLE_EXTENSION if args.binary else '.json'
+
+# training metrics are streamed as CSV or parquet, excel files are exported from CSV when finished
+metrics_extension = '.' + args.metrics
+
 # run learning algorithms according to options
 if args.run_q_learning:
 
     print('running q-learning ...')
 
-    q_learning = QLearning(env, episodes)
-    c = q_learning.fit(gamma=g, epsilon=e, filename='output/q-learning.xlsx')
-    q_learning.save('output/q-learning.json')
+    q_learning = QLearningClass(env, episodes)
+    q_learning.set_profiler(profiler)
+    c = q_learning.fit(gamma=g, epsilon=e, filename='output/q-learning' + metrics_extension,
+                       **checkpoint_options('q-learning'))
+    q_learning.save('output/q-learning' + extension)
+
+    if profiler is not None:
+        profiler.print_report()
+        profiler.dump('output/q-learning-profile.json')
+        profiler.reset()
 
     print('finished after {0} episodes'.format(c))
     print()
@@ -90,9 +106,16 @@ if args.run_sarsa:
 
     print('running sarsa ...')
 
-    sarsa = Sarsa(env, episodes)
-    c = sarsa.fit(gamma=g, epsilon=0.025, filename='output/ne-sarsa.xlsx')
-    sarsa.save('output/ne-sarsa.json')
+    sarsa = SarsaClass(env, episodes)
+    sarsa.set_profiler(profiler)
+    c = sarsa.fit(gamma=g, epsilon=0.025, filename='output/ne-sarsa' + metrics_extension,
+                   **checkpoint_options('ne-sarsa'))
+    sarsa.save('output/ne-sarsa' + extension)
+
+    if profiler is not None:
+        profiler.print_report()
+        profiler.dump('output/ne-sarsa-profile.json')
+        profiler.reset()
 
     print('finished after {0} episodes'.format(c))
     print()
@@ -100,9 +123,16 @@ if args.run_sarsa:
 if args.run_esarsa:
     print('running expected sarsa ...')
 
-    expected_sarsa = ExpectedSarsa(env, episodes)
-    c = expected_sarsa.fit(gamma=g, epsilon=0.025, filename='output/ne-expected-sarsa.xlsx')
-    expected_sarsa.save('output/ne-expected-sarsa.json')
+    expected_sarsa = ExpectedSarsaClass(env, episodes)
+    expected_sarsa.set_profiler(profiler)
+    c = expected_sarsa.fit(gamma=g, epsilon=0.025, filename='output/ne-expected-sarsa' + metrics_extension,
+                            **checkpoint_options('ne-expected-sarsa'))
+    expected_sarsa.save('output/ne-expected-sarsa' + extension)
+
+    if profiler is not None:
+        profiler.print_report()
+        profiler.dump('output/ne-expected-sarsa-profile.json')
+        profiler.reset()
 
     print('finished after {0} episodes'.format(c))
     print()
@@ -1,30 +1,118 @@
 import abc
 import ast
 import json
+import os
+import time
 
 import numpy as np
-import pandas as pd
+
+from collections import deque
+from osmenv.metrics import create_metrics_sink
+from osmenv.profiling import NULL_PROFILER
+from osmenv.storage import is_binary_q_table
+from osmenv.storage import read_checkpoint
+from osmenv.storage import read_q_table
+from osmenv.storage import write_checkpoint
+from osmenv.storage import write_q_table
+
+
+# number of episodes and maximum delta within these episodes required for convergence
+CONVERGENCE_EPISODES = 200
+CONVERGENCE_DELTA = 0.0001
 
 
 class TemporalDifferenceAlgorithm:
 
-    def __init__(self, environment, episodes=0):
+    _datatype = None
+
+    def __init__(self, environment, episodes=0, dense=False):
 
         self._env = environment
 
+        # timers of the training phases, nothing is measured unless a profiler is set
+        self._profiler = NULL_PROFILER
+
         # define convergence criteria
         self._num_episodes = episodes
 
-        # init q table
-        self._q_table = dict()
+        # actions applicable to each route, all actions are applicable if the environment doesn't mask any
+        self._action_mask = getattr(self._env.unwrapped, 'action_mask', None)
+
+        if self._action_mask is None:
+            self._action_mask = np.ones((self._env.observation_space[0].n, self._env.action_space.n), dtype=bool)
+
+        self._valid_actions = [np.flatnonzero(m) for m in self._action_mask]
+
+        # init q table, either as dict of states or as one contiguous array indexed by route, deviation,
+        # scenario and action
+        self._dense = dense
+
+        if self._dense:
+            self._q_table = np.zeros(self._q_shape())
+        else:
+            self._q_table = dict()
+
+            for r in range(self._env.observation_space[0].n):
+                for d in range(self._env.observation_space[1].n):
+                    for s in range(self._env.observation_space[2].n):
+                        self._q_table[(r, d, s)] = np.zeros(self._env.action_space.n)
+
+    @property
+    def profiler(self):
+        return self._profiler
+
+    def set_profiler(self, profiler):
+        self._profiler = profiler if profiler is not None else NULL_PROFILER
+
+    def fit(self, gamma, epsilon, epsilon_decay=0.999, alpha=0.8, filename=None, metrics=None, checkpoint=None,
+            checkpoint_every=1000):
+
+        terminate = False  # terminate flag
+
+        episode_deltas = deque(maxlen=CONVERGENCE_EPISODES)
+        episode_count = 0
 
-        for r in range(self._env.observation_space[0].n):
-            for d in range(self._env.observation_space[1].n):
-                for s in range(self._env.observation_space[2].n):
-                    self._q_table[(r, d, s)] = np.zeros(self._env.action_space.n)
+        # a run with the same configuration continues from its last checkpoint
+        parameters = self._checkpoint_parameters(gamma, epsilon, epsilon_decay, alpha)
+
+        if checkpoint is not None and os.path.exists(checkpoint):
+            epsilon, episode_count, terminate = self._restore_checkpoint(checkpoint, parameters, episode_deltas)
+
+        # episode records are streamed into the metrics sink, only the deltas required for the convergence check
+        # are kept in memory
+        if metrics is None:
+            metrics = create_metrics_sink(filename, self._datatype, start_episode=episode_count)
+
+        with metrics:
+            while terminate is False:
+
+                episode_start = time.time()
+                episode_step, episode_reward, episode_delta, epsilon = self._run_episode(gamma, epsilon,
+                                                                                         epsilon_decay, alpha)
+                episode_end = time.time()
+
+                episode_count += 1
+
+                self._profiler.count('episodes')
+                self._profiler.count('steps', episode_step)
+                episode_deltas.append(np.absolute(episode_delta))
+
+                metrics.write(episode_count, episode_step, episode_reward, episode_deltas[-1],
+                              episode_end - episode_start, epsilon)
+
+                terminate = self._converged(episode_count, episode_deltas)
+
+                # records are flushed first, thus the metrics cover at least all episodes of the checkpoint
+                if checkpoint is not None and (terminate or episode_count % checkpoint_every == 0):
+                    metrics.flush()
+                    self._write_checkpoint(checkpoint, parameters, epsilon, episode_count, episode_deltas, terminate)
+
+        return episode_count
 
     @abc.abstractmethod
-    def fit(self, gamma, epsilon, epsilon_decay=0.999, alpha=0.8, filename=None):
+    def _run_episode(self, gamma, epsilon, epsilon_decay, alpha):
+
+        # runs a single episode and returns its steps, reward, delta and the decayed epsilon
         return
 
     def predict(self, state):
@@ -32,13 +120,52 @@ class TemporalDifferenceAlgorithm:
         if len(state) == 2:
             state = state[0], 0, state[1]
 
+        if self._dense:
+            if all(0 <= i < n for i, n in zip(state, self._q_table.shape)):
+                return self._greedy_action(state, self._q_table[state])
+            else:
+                return -1
+
         if state in self._q_table.keys():
-            return np.argmax(self._q_table[state])
+            return self._greedy_action(state, self._q_table[state])
         else:
             return -1
 
+    def _greedy_action(self, state, q_actions):
+
+        # best of the actions applicable to the route of the state
+        valid_actions = self._valid_actions[state[0]]
+
+        return valid_actions[np.argmax(q_actions[valid_actions])]
+
     def load(self, filename):
 
+        # binary q-tables are mapped into memory, dense q-tables use them directly copy-on-write
+        if is_binary_q_table(filename):
+            q_table, header = read_q_table(filename, mode='c')
+
+            # the q-table must have been learned on the routes, deviations and scenarios of this environment
+            env = self._env.unwrapped
+            if header['routes'] != [str(r.id) for r in env.routes]:
+                raise RuntimeError('invalid q-table {0}, routes differ from environment'.format(filename))
+
+            if header['deviations'] != [str(d.id) for d in env.deviations]:
+                raise RuntimeError('invalid q-table {0}, deviations differ from environment'.format(filename))
+
+            if header['scenarios'] != [int(s) for s in env.scenarios]:
+                raise RuntimeError('invalid q-table {0}, scenarios differ from environment'.format(filename))
+
+            if tuple(q_table.shape) != self._q_shape():
+                raise RuntimeError('invalid q-table {0}, expected shape {1} but got {2}'.format(
+                    filename, self._q_shape(), tuple(q_table.shape)))
+
+            if self._dense:
+                self._q_table = q_table
+            else:
+                self._q_table = {k: np.array(q_table[k]) for k in np.ndindex(*q_table.shape[:-1])}
+
+            return
+
         # read JSON data
         with open(filename, 'r') as f:
             q_data = json.load(f)
@@ -47,12 +174,33 @@ class TemporalDifferenceAlgorithm:
 
         # remap q data to q-table
         q_table = {ast.literal_eval(k): np.array(v) for k, v in q_data.items()}
-        self._q_table = q_table
+
+        if self._dense:
+            self._q_table = np.zeros(self._q_shape())
+
+            for state, q_actions in q_table.items():
+                self._q_table[state] = q_actions
+        else:
+            self._q_table = q_table
 
     def save(self, filename):
 
+        # write binary q-table along with the IDs of routes, deviations and scenarios
+        if is_binary_q_table(filename):
+            env = self._env.unwrapped
+            write_q_table(filename, self._q_array(),
+                          [r.id for r in env.routes],
+                          [d.id for d in env.deviations],
+                          env.scenarios,
+                          self._action_mask)
+
+            return
+
         # re-map q-table data to JSONable format
-        q_data = {str(k): list(v) for k, v in self._q_table.items()}
+        if self._dense:
+            q_data = {str(k): list(self._q_table[k]) for k in np.ndindex(*self._q_table.shape[:-1])}
+        else:
+            q_data = {str(k): list(v) for k, v in self._q_table.items()}
 
         # write JSON file
         with open(filename, 'w') as f:
@@ -60,21 +208,88 @@ class TemporalDifferenceAlgorithm:
 
             f.close()
 
-    @staticmethod
-    def _create_monitoring_file(filename, datatype, e_count, e_steps, e_rewards, e_deltas, e_durations, e_epsilons):
+    def _checkpoint_parameters(self, gamma, epsilon, epsilon_decay, alpha):
+
+        # a checkpoint is only resumed by a run with the same configuration
+        return {
+            'datatype': self._datatype,
+            'shape': self._q_shape(),
+            'episodes': self._num_episodes,
+            'gamma': gamma,
+            'epsilon': epsilon,
+            'epsilon_decay': epsilon_decay,
+            'alpha': alpha
+        }
+
+    def _write_checkpoint(self, filename, parameters, epsilon, episode_count, episode_deltas, terminated):
+
+        # checkpoints are written between episodes, the environment is reset at the beginning of each episode and
+        # its state is given by its random generator
+        write_checkpoint(filename, {
+            'type': 'checkpoint',
+            'parameters': parameters,
+            'q_table': self._q_array(),
+            'epsilon': epsilon,
+            'episode_count': episode_count,
+            'episode_deltas': list(episode_deltas),
+            'terminated': terminated,
+            'random_state': np.random.get_state(),
+            'env_random_state': self._env.unwrapped.np_random.bit_generator.state
+        })
+
+    def _restore_checkpoint(self, filename, parameters, episode_deltas):
 
-        if filename is not None:
+        checkpoint = read_checkpoint(filename)
 
-            df = pd.DataFrame({
-                'episode': [e for e in range(1, e_count + 1)],
-                'steps': e_steps,
-                'reward': e_rewards,
-                'delta': e_deltas,
-                'duration': e_durations,
-                'epsilon': e_epsilons
-            })
+        if checkpoint['parameters'] != parameters:
+            raise RuntimeError('invalid checkpoint {0}, expected same configuration as the current run'.format(
+                filename))
 
-            writer = pd.ExcelWriter(filename, engine='xlsxwriter')
-            df.to_excel(writer, sheet_name=datatype, index=False)
+        self._set_q_array(checkpoint['q_table'])
 
-            writer.close()
+        episode_deltas.clear()
+        episode_deltas.extend(checkpoint['episode_deltas'])
+
+        np.random.set_state(checkpoint['random_state'])
+        self._env.unwrapped.np_random.bit_generator.state = checkpoint['env_random_state']
+
+        return checkpoint['epsilon'], checkpoint['episode_count'], checkpoint['terminated']
+
+    def _q_shape(self):
+        return (
+            self._env.observation_space[0].n,
+            self._env.observation_space[1].n,
+            self._env.observation_space[2].n,
+            self._env.action_space.n
+        )
+
+    def _q_array(self):
+
+        # dense q-tables are used directly, dict q-tables are copied into an array
+        if self._dense:
+            return self._q_table
+
+        q_table = np.zeros(self._q_shape())
+
+        for state, q_actions in self._q_table.items():
+            q_table[state] = q_actions
+
+        return q_table
+
+    def _set_q_array(self, q_table):
+
+        if self._dense:
+            self._q_table = q_table
+        else:
+            for state in self._q_table.keys():
+                self._q_table[state] = q_table[state].copy()
+
+    def _converged(self, episode_count, episode_deltas):
+
+        if episode_count <= CONVERGENCE_EPISODES:
+            return False
+
+        if self._num_episodes > 0:
+            return episode_count >= self._num_episodes
+        else:
+            return bool(np.max(episode_deltas) < CONVERGENCE_DELTA)
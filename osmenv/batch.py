@@ -0,0 +1,256 @@
+import abc
+import time
+
+import numpy as np
+
+from collections import deque
+from osmenv.algorithm import CONVERGENCE_EPISODES
+from osmenv.metrics import create_metrics_sink
+from osmenv.qlearning import QLearning
+from osmenv.sarsa import Sarsa
+from osmenv.esarsa import ExpectedSarsa
+
+
+class BatchTemporalDifferenceAlgorithm(abc.ABC):
+
+    def fit(self, gamma, epsilon, epsilon_decay=0.999, alpha=0.8, filename=None, metrics=None):
+
+        # episode records are streamed into the metrics sink, only the deltas required for the convergence check
+        # are kept in memory
+        if metrics is None:
+            metrics = create_metrics_sink(filename, self._datatype)
+
+        terminate = False  # terminate flag
+
+        episode_deltas = deque(maxlen=CONVERGENCE_EPISODES)
+        episode_count = 0
+
+        # work on a dense q-table in order to update all environments at once
+        q_table = self._q_array()
+        num_envs = self._env.num_envs
+
+        # init monitoring variables of each environment
+        steps = np.zeros(num_envs, dtype=np.int64)
+        rewards = np.zeros(num_envs)
+        deltas = np.zeros(num_envs)
+        durations = np.full(num_envs, time.time())
+        epsilons = np.zeros(num_envs)
+        actions = np.zeros(num_envs, dtype=np.int64)
+
+        # reset all environments and decay epsilon once per episode
+        states, _ = self._env.reset()
+        epsilon = self._begin_episodes(q_table, states, actions, epsilons, epsilon, epsilon_decay,
+                                       np.ones(num_envs, dtype=bool))
+
+        # run all episodes side by side
+        with metrics:
+            while terminate is False:
+
+                start = self._profiler.start()
+                next_states, step_rewards, dones, updates, actions = self._step_episodes(q_table, states, actions,
+                                                                                         epsilons, gamma, alpha)
+                self._profiler.stop('batch_step', start)
+                self._profiler.count('steps', num_envs)
+
+                states = next_states
+
+                steps += 1
+                rewards += (gamma ** steps) * step_rewards
+                deltas = np.maximum(deltas, -updates)
+
+                if not np.any(dones):
+                    continue
+
+                # collect monitoring data of each finished episode
+                episode_end = time.time()
+
+                for i in np.flatnonzero(dones):
+
+                    episode_count += 1
+                    episode_deltas.append(np.absolute(deltas[i]))
+
+                    self._profiler.count('episodes')
+
+                    metrics.write(episode_count, int(steps[i]), float(rewards[i]), episode_deltas[-1],
+                                  episode_end - durations[i], float(epsilons[i]))
+
+                    terminate = self._converged(episode_count, episode_deltas)
+
+                    if terminate:
+                        break
+
+                # restart finished episodes
+                states, _ = self._env.reset(dones)
+
+                steps[dones] = 0
+                rewards[dones] = 0
+                deltas[dones] = 0
+                durations[dones] = episode_end
+
+                start = self._profiler.start()
+                epsilon = self._begin_episodes(q_table, states, actions, epsilons, epsilon, epsilon_decay, dones)
+                self._profiler.stop('batch_begin', start)
+
+        # write results back into the q-table
+        self._set_q_array(q_table)
+
+        return episode_count
+
+    @abc.abstractmethod
+    def _begin_episodes(self, q_table, states, actions, epsilons, epsilon, epsilon_decay, mask):
+        pass
+
+    @abc.abstractmethod
+    def _step_episodes(self, q_table, states, actions, epsilons, gamma, alpha):
+        pass
+
+    def _masked_q_actions(self, q_actions, routes):
+
+        # inapplicable actions of the routes are never the best ones
+        return np.where(self._action_mask[routes], q_actions, -np.inf)
+
+    @staticmethod
+    def _apply_updates(q_table, index, updates):
+
+        # transitions hitting the same state and action are averaged, summing them up
+        # would apply the same update several times based on the same q values
+        flat_index = np.ravel_multi_index(index, q_table.shape)
+        unique_index, inverse = np.unique(flat_index, return_inverse=True)
+
+        mean_updates = np.bincount(inverse, weights=updates) / np.bincount(inverse)
+        q_table.reshape(-1)[unique_index] += mean_updates
+
+
+class BatchQLearning(BatchTemporalDifferenceAlgorithm, QLearning):
+
+    def __init__(self, environment, episodes=0, dense=False):
+        super(BatchQLearning, self).__init__(environment, episodes, dense)
+
+    def _begin_episodes(self, q_table, states, actions, epsilons, epsilon, epsilon_decay, mask):
+
+        # decay epsilon once for each episode started
+        epsilon_sequence = epsilon * epsilon_decay ** np.arange(1, np.count_nonzero(mask) + 1)
+        epsilons[mask] = epsilon_sequence
+
+        return epsilon_sequence[-1]
+
+    def _step_episodes(self, q_table, states, actions, epsilons, gamma, alpha):
+
+        num_envs = len(states)
+        r, d, s = states[:, 0], states[:, 1], states[:, 2]
+
+        # pick applicable actions with epsilon-greedy strategy, exploring picks the k-th applicable action
+        q_actions = q_table[r, d, s]
+        masks = self._action_mask[r]
+
+        explore = (np.random.random(num_envs) < epsilons) | (np.sum(q_actions, axis=1) == 0)
+        explore_actions = np.random.randint(0, np.sum(masks, axis=1))
+        actions = np.where(explore,
+                           np.argmax(np.cumsum(masks, axis=1) > explore_actions[:, None], axis=1),
+                           np.argmax(self._masked_q_actions(q_actions, r), axis=1))
+
+        # apply actions in environment
+        next_states, rewards, dones, _ = self._env.step(actions)
+
+        # update q values of all environments at once
+        q_values = q_actions[np.arange(num_envs), actions]
+        next_q_values = np.max(self._masked_q_actions(
+            q_table[next_states[:, 0], next_states[:, 1], next_states[:, 2]], next_states[:, 0]), axis=1)
+
+        updates = rewards + alpha * (gamma * next_q_values - q_values)
+        self._apply_updates(q_table, (r, d, s, actions), updates)
+
+        return next_states, rewards, dones, updates, actions
+
+
+class BatchSarsa(BatchTemporalDifferenceAlgorithm, Sarsa):
+
+    def __init__(self, environment, episodes=0, dense=False):
+        super(BatchSarsa, self).__init__(environment, episodes, dense)
+
+    def _begin_episodes(self, q_table, states, actions, epsilons, epsilon, epsilon_decay, mask):
+
+        # first action of each episode is chosen before epsilon is decayed
+        epsilon_sequence = epsilon * epsilon_decay ** np.arange(np.count_nonzero(mask) + 1)
+        epsilon_sequence[1:] = np.maximum(epsilon_sequence[1:], self._epsilon_min)
+
+        actions[mask] = self._batch_strategy(q_table, states[mask], epsilon_sequence[:-1])
+        epsilons[mask] = epsilon_sequence[1:]
+
+        return epsilon_sequence[-1]
+
+    def _step_episodes(self, q_table, states, actions, epsilons, gamma, alpha):
+
+        r, d, s = states[:, 0], states[:, 1], states[:, 2]
+
+        # apply actions in environment, the action of an episode is kept for all its steps, the next action is only
+        # used to look up the next q value
+        next_states, rewards, dones, _ = self._env.step(actions)
+        next_actions = self._batch_strategy(q_table, next_states, epsilons)
+
+        # update q values of all environments at once
+        q_values = q_table[r, d, s, actions]
+        next_q_values = q_table[next_states[:, 0], next_states[:, 1], next_states[:, 2], next_actions]
+
+        updates = rewards + alpha * (gamma * next_q_values - q_values)
+        self._apply_updates(q_table, (r, d, s, actions), updates)
+
+        return next_states, rewards, dones, updates, actions
+
+    def _batch_strategy(self, q_table, states, epsilons):
+
+        # n-epsilon-greedy strategy for several states at once
+
+        n = 3
+        q_actions = q_table[states[:, 0], states[:, 1], states[:, 2]]
+        masks = self._action_mask[states[:, 0]]
+        masked_q_actions = self._masked_q_actions(q_actions, states[:, 0])
+        count = len(q_actions)
+
+        explore = (np.random.random(count) < epsilons) | (np.sum(q_actions, axis=1) == 0)
+
+        # consider only top N actions and those which are never visited yet ( => == 0), both among the applicable
+        # actions only, an action being both is weighted twice, like the list concatenation of the single strategy
+        rows = np.arange(count)[:, None]
+        weights = ((q_actions == 0.0) & masks).astype(np.float64)
+        top_actions = np.argsort(masked_q_actions, axis=1, kind='stable')[:, -n:]
+        weights[rows, top_actions] += masks[rows, top_actions]
+
+        cumulative_weights = np.cumsum(weights, axis=1)
+        samples = np.random.random(count)[:, None] * cumulative_weights[:, -1:]
+        explore_actions = np.argmax(samples < cumulative_weights, axis=1)
+
+        return np.where(explore, explore_actions, np.argmax(masked_q_actions, axis=1))
+
+
+class BatchExpectedSarsa(BatchSarsa, ExpectedSarsa):
+
+    def __init__(self, environment, episodes=0, dense=False):
+        super(BatchExpectedSarsa, self).__init__(environment, episodes, dense)
+
+    def _step_episodes(self, q_table, states, actions, epsilons, gamma, alpha):
+
+        num_envs = len(states)
+        r, d, s = states[:, 0], states[:, 1], states[:, 2]
+
+        # apply actions in environment, the action of an episode is kept for all its steps
+        next_states, rewards, dones, _ = self._env.step(actions)
+
+        # expected value of the next state using the action probabilities of the current state
+        # inapplicable actions are never chosen and thus don't contribute
+        q_actions = q_table[r, d, s]
+        masks = self._action_mask[r]
+        next_actions = q_table[next_states[:, 0], next_states[:, 1], next_states[:, 2]]
+
+        best_actions = np.argmax(self._masked_q_actions(q_actions, r), axis=1)
+
+        expected_action_update = epsilons / np.sum(masks, axis=1) * np.sum(next_actions * masks, axis=1) + \
+            (1.0 - epsilons) * next_actions[np.arange(num_envs), best_actions]
+
+        # update q values of all environments at once
+        q_values = q_actions[np.arange(num_envs), actions]
+
+        updates = rewards + alpha * (gamma * expected_action_update - q_values)
+        self._apply_updates(q_table, (r, d, s, actions), updates)
+
+        return next_states, rewards, dones, updates, actions
@@ -0,0 +1,126 @@
+import numpy as np
+
+from osmenv.data import Deviation
+from osmenv.data import Route
+from osmenv.data import node_array
+from osmenv.storage import read_arrays
+from osmenv.storage import write_arrays
+
+BUNDLE_EXTENSION = '.bundle'
+
+
+class Bundle:
+
+    def __init__(self, routes, deviations, scenarios, route_distances, deviation_lengths, node_ids, coordinates):
+
+        # routes, deviations and scenarios of an environment along with everything derived from the OSM data
+        self.routes = routes
+        self.deviations = deviations
+        self.scenarios = scenarios
+
+        # cumulative distances along each route and total length of each deviation
+        self.route_distances = route_distances
+        self.deviation_lengths = deviation_lengths
+
+        # sorted IDs and lat, lon coordinates of all nodes of routes and deviations
+        self.node_ids = node_ids
+        self.coordinates = coordinates
+
+    @classmethod
+    def from_environment(cls, env):
+
+        # the environment was loaded from the OSM data once, its routes, deviations and lengths are taken as they are
+        env = env.unwrapped
+
+        node_ids = np.unique(np.concatenate(
+            [np.asarray(r.nodes, dtype=np.int64) for r in env.routes] +
+            [np.asarray(d.nodes, dtype=np.int64) for d in env.deviations]
+        ))
+
+        return cls(env.routes, env.deviations, list(env.scenarios),
+                   [np.asarray(d, dtype=np.float64) for d in env._route_distances],
+                   np.asarray(env._deviation_lengths, dtype=np.float64),
+                   node_ids, env._router._coordinates(node_ids))
+
+    def node_coordinates(self, nodes):
+
+        # lat, lon coordinates of nodes of routes and deviations
+        nodes = np.asarray(nodes, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.node_ids, nodes), len(self.node_ids) - 1)
+
+        if np.any(self.node_ids[positions] != nodes):
+            raise KeyError(int(nodes[int(np.argmax(self.node_ids[positions] != nodes))]))
+
+        return self.coordinates[positions]
+
+    def save(self, filename):
+
+        # variable length items are concatenated, the items i are located at offsets[i]:offsets[i + 1]
+        route_offsets = _offsets([len(r.nodes) for r in self.routes])
+        stop_offsets = _offsets([len(r.stop_nodes) for r in self.routes])
+        deviation_offsets = _offsets([len(d.nodes) for d in self.deviations])
+
+        write_arrays(filename, {
+            'route_offsets': route_offsets,
+            'route_nodes': node_array(_concatenate([r.nodes for r in self.routes])),
+            'route_distances': _concatenate(self.route_distances, np.float64),
+            'stop_offsets': stop_offsets,
+            'stop_nodes': node_array(_concatenate([r.stop_nodes for r in self.routes])),
+            'deviation_offsets': deviation_offsets,
+            'deviation_nodes': node_array(_concatenate([d.nodes for d in self.deviations])),
+            'deviation_lengths': np.asarray(self.deviation_lengths, dtype=np.float64),
+            'scenarios': np.asarray(self.scenarios, dtype=np.int64),
+            'node_ids': self.node_ids,
+            'coordinates': self.coordinates
+        }, {
+            'type': 'bundle',
+            'routes': [{'id': r.id, 'length': r.length, 'stop_names': list(r.stop_names)} for r in self.routes],
+            'deviations': [{'id': d.id, 'length': d.length} for d in self.deviations]
+        })
+
+    @classmethod
+    def load(cls, filename):
+
+        header, arrays = read_arrays(filename)
+
+        if header.get('type') != 'bundle':
+            raise RuntimeError('invalid file {0}, expected bundle'.format(filename))
+
+        # routes and deviations are views into the mapped file, nothing is read until they are accessed
+        route_offsets = arrays['route_offsets'].tolist()
+        stop_offsets = arrays['stop_offsets'].tolist()
+        deviation_offsets = arrays['deviation_offsets'].tolist()
+
+        route_nodes = np.asarray(arrays['route_nodes'])
+        route_distances = np.asarray(arrays['route_distances'])
+        stop_nodes = np.asarray(arrays['stop_nodes'])
+        deviation_nodes = np.asarray(arrays['deviation_nodes'])
+
+        routes = [
+            Route(r['id'], r['length'], r['stop_names'], stop_nodes[stop_offsets[i]:stop_offsets[i + 1]],
+                  route_nodes[route_offsets[i]:route_offsets[i + 1]])
+            for i, r in enumerate(header['routes'])
+        ]
+
+        deviations = [
+            Deviation(d['length'], deviation_nodes[deviation_offsets[i]:deviation_offsets[i + 1]], d['id'])
+            for i, d in enumerate(header['deviations'])
+        ]
+
+        return cls(routes, deviations, arrays['scenarios'].tolist(),
+                   [route_distances[route_offsets[i]:route_offsets[i + 1]] for i in range(len(routes))],
+                   np.asarray(arrays['deviation_lengths']),
+                   np.asarray(arrays['node_ids']),
+                   np.asarray(arrays['coordinates']))
+
+
+def _offsets(lengths):
+    return np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int64)
+
+
+def _concatenate(arrays, dtype=np.int64):
+
+    if len(arrays) == 0:
+        return np.zeros(0, dtype=dtype)
+
+    return np.concatenate([np.asarray(a, dtype=dtype) for a in arrays])
@@ -0,0 +1,193 @@
+import json
+import os
+
+import numpy as np
+
+from osmenv.spatial import haversine
+
+CATALOG_FILENAME = 'catalog.json'
+
+
+class CatalogGenerator:
+
+    def __init__(self, router, seed=0, min_length=2.0, max_length=8.0, stop_spacing=0.4,
+                 min_section_length=0.2, max_section_length=1.0):
+
+        # routes and deviations are found by the router on its own network
+        self._router = router
+        self._graph = router._get_graph()
+        self._rng = np.random.default_rng(seed)
+
+        # straight line distance between start and end of a route in km
+        self._min_length = min_length
+        self._max_length = max_length
+
+        # distance between stops along a route and length of the route sections bypassed by deviations in km
+        self._stop_spacing = stop_spacing
+        self._min_section_length = min_section_length
+        self._max_section_length = max_section_length
+
+        # only nodes with outgoing edges are suitable as start or end of a route
+        self._candidates = np.flatnonzero(np.diff(np.asarray(self._graph.offsets)) > 0)
+
+        if len(self._candidates) < 2:
+            raise RuntimeError('invalid network, expected at least two connected nodes')
+
+    def generate(self, num_routes, deviations_per_route=3, num_scenarios=10, max_attempts=20):
+
+        routes = list()
+        deviations = list()
+        scenario_candidates = list()
+
+        for _ in range(num_routes * max_attempts):
+            if len(routes) >= num_routes:
+                break
+
+            route = self.sample_route('route{0}'.format(len(routes) + 1))
+            if route is None:
+                continue
+
+            routes.append(route)
+
+            # deviations bypass a section of the route, any node of this section is a reasonable scenario
+            cumulative_length = self._router.cumulative_length(route['nodes'])
+            route_deviations = 0
+
+            for _ in range(deviations_per_route * max_attempts):
+                if route_deviations >= deviations_per_route:
+                    break
+
+                deviation, blocked_nodes = self.sample_deviation(route, 'deviation{0}'.format(len(deviations) + 1),
+                                                                 cumulative_length)
+                if deviation is None:
+                    continue
+
+                deviations.append(deviation)
+                route_deviations += 1
+
+                scenario_candidates.append(blocked_nodes[int(self._rng.integers(0, len(blocked_nodes)))])
+
+        if len(routes) < num_routes:
+            raise RuntimeError('could only sample {0} of {1} routes'.format(len(routes), num_routes))
+
+        # scenarios are distinct nodes, each of them can be bypassed by at least one deviation
+        scenario_candidates = list(dict.fromkeys(scenario_candidates))
+        scenarios = [scenario_candidates[i] for i in sorted(
+            self._rng.choice(len(scenario_candidates), min(num_scenarios, len(scenario_candidates)), replace=False)
+        )]
+
+        return {
+            'routes': routes,
+            'deviations': deviations,
+            'scenarios': scenarios
+        }
+
+    def sample_route(self, route_id):
+
+        coordinates = self._graph.coordinates
+        start = int(self._rng.choice(self._candidates))
+
+        # end node is chosen among all nodes within the distance range around the start node
+        distances = haversine(coordinates[start, 0], coordinates[start, 1],
+                              coordinates[self._candidates, 0], coordinates[self._candidates, 1])
+        ends = self._candidates[(distances >= self._min_length) & (distances <= self._max_length)]
+
+        if len(ends) == 0:
+            return None
+
+        end = int(self._rng.choice(ends))
+
+        status, nodes, _, length = self._router.find_route(int(self._graph.node_ids[start]),
+                                                          int(self._graph.node_ids[end]))
+        if status != 'success' or len(nodes) < 3:
+            return None
+
+        # place stops along the route in regular distances, the first and the last node are always stops
+        cumulative_length = self._router.cumulative_length(nodes)
+        positions = np.unique(np.concatenate([
+            np.searchsorted(cumulative_length, np.arange(0.0, cumulative_length[-1], self._stop_spacing)),
+            [len(nodes) - 1]
+        ]))
+
+        return {
+            'id': route_id,
+            'length': length,
+            'stops': [{'name': 'Stop {0}'.format(nodes[p]), 'node': nodes[p]} for p in positions.tolist()],
+            'nodes': nodes
+        }
+
+    def sample_deviation(self, route, deviation_id, cumulative_length=None):
+
+        nodes = route['nodes']
+        if cumulative_length is None:
+            cumulative_length = self._router.cumulative_length(nodes)
+
+        # choose a section of the route, the deviation leaves the route at its first and returns at its last node
+        first = int(self._rng.integers(0, len(nodes) - 2))
+        section_length = self._rng.uniform(self._min_section_length, self._max_section_length)
+        last = int(np.searchsorted(cumulative_length, cumulative_length[first] + section_length))
+
+        if last >= len(nodes) - 1 or last - first < 2:
+            return None, None
+
+        blocked_nodes = [n for n in dict.fromkeys(nodes[first + 1:last]) if n != nodes[first] and n != nodes[last]]
+        if len(blocked_nodes) == 0:
+            return None, None
+
+        status, deviation_nodes, _, length = self._router.find_route(nodes[first], nodes[last],
+                                                                     not_via_list=blocked_nodes)
+        if status != 'success' or len(deviation_nodes) < 2:
+            return None, None
+
+        return {
+            'id': deviation_id,
+            'length': length,
+            'nodes': deviation_nodes
+        }, blocked_nodes
+
+
+def write_catalog(directory, catalog):
+
+    # each route and deviation is written into a JSON file of its own, an index file lists all of them
+    os.makedirs(directory, exist_ok=True)
+
+    index = {
+        'routes': list(),
+        'deviations': list(),
+        'scenarios': catalog['scenarios']
+    }
+
+    for kind in ['routes', 'deviations']:
+        for item in catalog[kind]:
+            filename = item['id'] + '.json'
+
+            with open(os.path.join(directory, filename), 'w') as f:
+                json.dump(item, f)
+
+                f.close()
+
+            index[kind].append(filename)
+
+    index_filename = os.path.join(directory, CATALOG_FILENAME)
+
+    with open(index_filename, 'w') as f:
+        json.dump(index, f, indent=2)
+
+        f.close()
+
+    return index_filename
+
+
+def load_catalog(filename):
+
+    with open(filename, 'r') as f:
+        index = json.load(f)
+
+        f.close()
+
+    # file names are relative to the index file
+    directory = os.path.dirname(filename)
+
+    return [os.path.join(directory, r) for r in index['routes']], \
+        [os.path.join(directory, d) for d in index['deviations']], \
+        index['scenarios']
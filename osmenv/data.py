@@ -1,9 +1,20 @@
+import json
+import os
+
+import numpy as np
+
+from bisect import bisect_left
 from dataclasses import dataclass
+from dataclasses import field
 from dataclasses import fields
 
 
 def construct_dataclass(cls: type, src):
 
+    # array backed classes know how to construct themselves
+    if hasattr(cls, 'from_dict'):
+        return cls.from_dict(src)
+
     field_types_lookup = {
         field.name: field.type
         for field in fields(cls)
@@ -31,15 +42,135 @@ class Stop:
     node: int
 
 
-@dataclass
+def node_array(nodes):
+
+    # node IDs are stored as int32 unless they don't fit into it
+    nodes = np.asarray(nodes, dtype=np.int64).reshape(-1)
+
+    if len(nodes) == 0 or (nodes.min() >= np.iinfo(np.int32).min and nodes.max() <= np.iinfo(np.int32).max):
+        return nodes.astype(np.int32)
+
+    return nodes
+
+
+def _node_positions(nodes):
+
+    # all positions of each node, routes may pass a node more than once
+    positions = dict()
+    for i, node in enumerate(nodes):
+        positions.setdefault(node, list()).append(i)
+
+    return positions
+
+
+@dataclass(slots=True)
 class Route:
     id: str
     length: float
-    stops: list[Stop]
-    nodes: list
+    stop_names: list
+    stop_nodes: np.ndarray
+    nodes: np.ndarray
 
+    # lookup structures, built on first use since most routes of a large area are never looked at
+    _node_positions: dict = field(default=None, init=False, repr=False, compare=False)
+    _node_set: set = field(default=None, init=False, repr=False, compare=False)
 
-@dataclass
+    @classmethod
+    def from_dict(cls, src):
+
+        stops = src.get('stops', list())
+
+        return cls(
+            src.get('id'),
+            src.get('length'),
+            [stop['name'] for stop in stops],
+            node_array([stop['node'] for stop in stops]),
+            node_array(src['nodes'])
+        )
+
+    @property
+    def stops(self):
+        return [Stop(name, node) for name, node in zip(self.stop_names, self.stop_nodes.tolist())]
+
+    @property
+    def node_positions(self):
+
+        if self._node_positions is None:
+            self._node_positions = _node_positions(self.nodes.tolist())
+
+        return self._node_positions
+
+    @property
+    def node_set(self):
+
+        if self._node_set is None:
+            self._node_set = set(self.node_positions.keys())
+
+        return self._node_set
+
+    def position(self, node):
+
+        # first position of a node, like list.index
+        return self.node_positions[node][0]
+
+    def contains(self, node, start=0, end=None):
+
+        # whether the node occurs within nodes[start:end]
+        positions = self.node_positions.get(node)
+        if positions is None:
+            return False
+
+        end = len(self.nodes) + end if end is not None and end < 0 else end
+        i = bisect_left(positions, start)
+
+        return i < len(positions) and (end is None or positions[i] < end)
+
+
+@dataclass(slots=True)
 class Deviation:
     length: float
-    nodes: list
+    nodes: np.ndarray
+    id: str = None
+
+    # lookup structure, built on first use
+    _node_set: set = field(default=None, init=False, repr=False, compare=False)
+
+    @classmethod
+    def from_dict(cls, src):
+        return cls(src.get('length'), node_array(src['nodes']), src.get('id'))
+
+    @property
+    def node_set(self):
+
+        if self._node_set is None:
+            self._node_set = set(self.nodes.tolist())
+
+        return self._node_set
+
+
+def _load_json(filename):
+
+    with open(filename, 'r') as f:
+        content = json.load(f)
+
+        f.close()
+
+    return content
+
+
+def load_routes(filenames):
+    return [Route.from_dict(_load_json(filename)) for filename in filenames]
+
+
+def load_deviations(filenames):
+
+    deviations = list()
+    for filename in filenames:
+        deviation_dict = _load_json(filename)
+
+        # deviations are identified by their file name unless they have an ID on their own
+        deviation_dict.setdefault('id', os.path.splitext(os.path.basename(filename))[0])
+
+        deviations.append(Deviation.from_dict(deviation_dict))
+
+    return deviations
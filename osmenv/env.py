@@ -1,63 +1,42 @@
 import gym
-import json
 
+import numpy as np
+
+from osmenv.bundle import Bundle
 from osmenv.routing import OfflineRouter
-from osmenv.data import construct_dataclass
-from osmenv.data import Route
-from osmenv.data import Deviation
+from osmenv.data import load_deviations
+from osmenv.data import load_routes
+from osmenv.presets import ROUTER_TYPE
 
 
 class Environment(gym.Env):
 
-    def __init__(self, osm_file, route_files, deviation_files, scenarios):
+    def __init__(self, osm_file=None, route_files=None, deviation_files=None, scenarios=None, cache_dir=None,
+                 action_masking=True, bundle=None, weights=None, max_weight=4):
         super(Environment, self).__init__()
 
-        # load OSM data in order to calculate length and verify routes
-        self._router = OfflineRouter(osm_file, {
-            'name': 'bus',
-            'weights': {
-                'motorway': 0.5,
-                'trunk': 0.75,
-                'primary': 1.0,
-                'secondary': 1.0,
-                'tertiary': 1.0,
-                'unclassified': 1.0,
-                'residential': 1.0,
-                'living_street': 1.0,
-                'pedestrian': 1.0,
-                'footway': 1.0
-            },
-            'access': ['access', 'walk', 'psv']
-        })
-
-        # load available routes
-        self._routes = list()
-
-        for route_file in route_files:
-            self._load_json_route(route_file)
-
-        # load available deviations
-        self._deviations = list()
-
-        for deviation_file in deviation_files:
-            self._load_json_deviation(deviation_file)
-
-        # store all sectors which could be blocked as scenario
-        self._scenarios = scenarios
+        # routes, deviations, scenarios and lengths are either loaded from a precompiled bundle or from the OSM data
+        # and the route and deviation files
+        if bundle is not None:
+            self._load_bundle(bundle)
+        elif osm_file is None or route_files is None or deviation_files is None or scenarios is None:
+            raise RuntimeError('invalid environment, expected bundle or OSM file, routes, deviations and scenarios')
+        else:
+            self._load_files(osm_file, route_files, deviation_files, scenarios, cache_dir)
 
         # member variables representing the current state
         self._status_route = 0  # defines the current route viewed
         self._status_deviation = 0  # defines the current deviation the trip remains in
         self._status_scenario = 0  # defines the blocked sector in this
 
-        # define weights for reward calculation
-        self._weights = {
+        # define weights for reward calculation, rewards are computed once with the weights given here
+        self._weights = weights if weights is not None else {
             'length': 1,
             'share': 1,
             'stops': 2
         }
 
-        self._max_weight = 4
+        self._max_weight = max_weight
 
         # define action and observation space
         self.action_space = gym.spaces.Discrete(len(self._deviations) + 1)  # each possible deviation is an action
@@ -65,13 +44,94 @@ class Environment(gym.Env):
         self.observation_space = gym.spaces.Tuple([
             gym.spaces.Discrete(len(self._routes)),
             gym.spaces.Discrete(len(self._deviations) + 1),  # action 0 is no deviation, all others are deviations
-            gym.spaces.Discrete(len(scenarios))
+            gym.spaces.Discrete(len(self._scenarios))
         ])
 
+        # deviations are only applicable to routes containing their start and end, no deviation is always applicable
+        self._applicable = self._compute_applicable()
+
+        self._action_masking = action_masking
+        self._action_mask = self._compute_action_mask()
+
+        # precompute reward and terminated flag of each route, deviation and scenario combination
+        self._rewards = None
+        self._terminated = None
+
+        self._compute_rewards()
+
+    def _load_files(self, osm_file, route_files, deviation_files, scenarios, cache_dir):
+
+        # load OSM data in order to calculate length and verify routes
+        self._router = OfflineRouter(osm_file, ROUTER_TYPE, cache_dir)
+
+        self._bundle = None
+
+        # load available routes and deviations
+        self._routes = load_routes(route_files)
+        self._deviations = load_deviations(deviation_files)
+
+        # store all sectors which could be blocked as scenario
+        self._scenarios = scenarios
+
+        # cumulative distances along each route and total length of each deviation, used to assess deviated routes
+        self._route_distances = [self._router.cumulative_length(r.nodes) for r in self._routes]
+        self._deviation_lengths = [self._router.route_length(d.nodes) for d in self._deviations]
+
+    def _load_bundle(self, filename):
+
+        # everything derived from the OSM data is part of the bundle, thus no router is required
+        bundle = Bundle.load(filename)
+
+        self._router = None
+        self._bundle = bundle
+
+        self._routes = bundle.routes
+        self._deviations = bundle.deviations
+        self._scenarios = bundle.scenarios
+
+        self._route_distances = bundle.route_distances
+        self._deviation_lengths = bundle.deviation_lengths
+
+    @property
+    def routes(self):
+        return self._routes
+
+    @property
+    def deviations(self):
+        return self._deviations
+
+    @property
+    def scenarios(self):
+        return self._scenarios
+
+    @property
+    def action_mask(self):
+        return self._action_mask
+
+    @property
+    def reward_table(self):
+        return self._rewards
+
+    @property
+    def terminated_table(self):
+        return self._terminated
+
+    def network_nodes(self):
+
+        # IDs and lat, lon coordinates of all nodes known to the environment, these are all nodes of the network if
+        # loaded from the OSM data, but only the nodes of routes and deviations if loaded from a bundle
+        if self._router is not None:
+            return self._router.nodes()
+
+        return self._bundle.node_ids, self._bundle.coordinates
+
     def set_weights(self, weights, max_weight=4):
         self._weights = weights
         self._max_weight = max_weight
 
+        # weights are part of the reward calculation, thus all rewards need to be updated
+        self._compute_rewards()
+
     def step(self, action):
 
         self._status_deviation = action
@@ -106,94 +166,113 @@ class Environment(gym.Env):
         return {
             'route': self._routes[self._status_route],
             'deviation': self._deviations[self._status_deviation - 1] if self._status_deviation > 0 else None,
-            'scenario': self._scenarios[self._status_scenario]
+            'scenario': self._scenarios[self._status_scenario],
+            'action_mask': self._action_mask[self._status_route]
         }
 
     def _get_reward(self, action):
 
-        # extract current route and used scenario
-        route = self._routes[self._status_route]
-        scenario = self._scenarios[self._status_scenario]
+        # outcome of each state is known in advance, thus only look it up
+        reward = self._rewards[self._status_route, action, self._status_scenario]
+        terminated = self._terminated[self._status_route, action, self._status_scenario]
 
-        # construct current node sequence out of route and chosen deviation
-        if self._status_deviation > 0:
+        return float(reward), bool(terminated)
 
-            # a deviation was chosen, review the effects of this deviation
-            deviation_nodes = self._deviations[self._status_deviation - 1].nodes
-            deviation_start = deviation_nodes[0]
-            deviation_end = deviation_nodes[-1]
+    def _compute_applicable(self):
 
-            # check whether deviation begins and ends in the route
-            # otherwise it would never be reached, this the vehicle is not deviated
-            if deviation_start in route.nodes and deviation_end in route.nodes:
+        applicable = np.ones((len(self._routes), len(self._deviations) + 1), dtype=bool)
 
-                # take head and tail of current route and put deviation in between
-                route_head = route.nodes[0:route.nodes.index(deviation_start)]
-                route_tail = route.nodes[route.nodes.index(deviation_end) + 1:-1]
+        for r, route in enumerate(self._routes):
+            for d, deviation in enumerate(self._deviations):
+                applicable[r, d + 1] = deviation.nodes[0] in route.node_set and deviation.nodes[-1] in route.node_set
 
-                vehicle_node_sequence = route_head + deviation_nodes + route_tail
-            else:
-                vehicle_node_sequence = route.nodes
-        else:
+        return applicable
+
+    def _compute_action_mask(self):
+
+        if self._action_masking:
+            return self._applicable.copy()
+
+        return np.ones((len(self._routes), len(self._deviations) + 1), dtype=bool)
+
+    def _compute_rewards(self):
+
+        shape = (len(self._routes), len(self._deviations) + 1, len(self._scenarios))
+
+        rewards = np.zeros(shape, dtype=np.float64)
+        terminated = np.zeros(shape, dtype=bool)
+
+        scenarios = np.asarray(self._scenarios, dtype=np.int64)
+
+        for r in range(len(self._routes)):
+            rewards[r], terminated[r] = self._compute_route_rewards(r, scenarios)
+
+        self._rewards = rewards
+        self._terminated = terminated
+
+    def _compute_route_rewards(self, route_index, scenarios):
+
+        # rewards and terminated flags of all deviations and scenarios of a route
+        route = self._routes[route_index]
+        nodes = np.asarray(route.nodes, dtype=np.int64)
+
+        # scenarios blocking the route require a deviation, the others don't
+        blocked = np.isin(scenarios, nodes)
 
-            # no deviation chosen, thus no nodes available... store this for further processing
-            deviation_nodes = list()
+        # without deviation or with a deviation never reached, the vehicle remains on its route, which is perfect
+        # unless the route is blocked, choosing a deviation which is not required is suboptimal
+        rewards = np.full((len(self._deviations) + 1, len(scenarios)), -1.0)
+        terminated = np.tile(~blocked, (len(self._deviations) + 1, 1))
 
-            # no deviation was chosen, vehicle remains on route
-            vehicle_node_sequence = route.nodes
+        rewards[0, ~blocked] = 1
 
-        terminated = self._scenarios[self._status_scenario] not in vehicle_node_sequence
+        # only deviations beginning and ending in the route change anything
+        for deviation_index in np.flatnonzero(self._applicable[route_index, 1:]) + 1:
+            deviation = self._deviations[deviation_index - 1]
 
-        # assess action critically
-        if scenario in route.nodes:  # deviation is required at all for current trip
-            if scenario not in vehicle_node_sequence:  # deviation was successful in general, further review required
+            # vehicle takes head and tail of current route and the deviation in between
+            # the head is nodes[:head_end], the tail is nodes[tail_start:-1]
+            head_end = route.position(deviation.nodes[0])
+            tail_start = route.position(deviation.nodes[-1]) + 1
 
-                # consider total length of original route and deviation route
-                original_route_length = self._router.route_length(route.nodes)
-                deviated_route_length = self._router.route_length(vehicle_node_sequence)
+            vehicle_nodes = np.concatenate((nodes[:head_end], np.asarray(deviation.nodes, dtype=np.int64),
+                                            nodes[tail_start:-1]))
 
-                length_factor = (original_route_length / deviated_route_length) ** \
-                                (self._weights['length'] / self._max_weight)
+            bypassed = ~np.isin(scenarios, vehicle_nodes)
+            terminated[deviation_index] = bypassed
 
-                # consider how many stops are missing due to used deviation
-                reached_stops = 0
-                for stop in route.stops:
-                    if stop['node'] in vehicle_node_sequence:
-                        reached_stops += 1
+            # deviation was successful if it bypasses a blocked node, further review required
+            successful = blocked & bypassed
+            if not np.any(successful):
+                continue
 
-                stop_factor = (reached_stops / len(route.stops)) ** \
-                              (self._weights['stops'] / self._max_weight)
+            # consider total length of original route and deviation route
+            original_route_length = self._route_distances[route_index][-1]
+            deviated_route_length = self._splice_length(route_index, deviation_index, head_end, tail_start)
 
-                # use all factors to determine final deviation quality
-                reward = 1 * length_factor * stop_factor
-            else:  # deviation was NOT successful at all, trip still affected by scenario
-                reward = -1
-        else:  # deviation is NOT required for current trip
-            if action < 1:  # there was no deviation chosen at all, perfectly
-                reward = 1
-            else:
-                reward = -1  # there was a deviation chosen even if it would not be required ... suboptimal
+            length_factor = (original_route_length / deviated_route_length) ** \
+                            (self._weights['length'] / self._max_weight)
 
-        return reward, terminated
+            # consider how many stops are missing due to used deviation
+            reached_stops = int(np.count_nonzero(np.isin(route.stop_nodes, vehicle_nodes)))
 
-    def _load_json_route(self, filename):
+            stop_factor = (reached_stops / len(route.stop_nodes)) ** \
+                          (self._weights['stops'] / self._max_weight)
 
-        with open(filename, 'r') as f:
-            route_dict = json.load(f)
+            # use all factors to determine final deviation quality
+            rewards[deviation_index, successful] = 1 * length_factor * stop_factor
 
-            f.close()
+        return rewards, terminated
 
-        # add route to member
-        route = construct_dataclass(Route, route_dict)
-        self._routes.append(route)
+    def _splice_length(self, route_index, deviation_index, head_end, tail_start):
 
-    def _load_json_deviation(self, filename):
+        distances = self._route_distances[route_index]
 
-        with open(filename, 'r') as f:
-            deviation_dict = json.load(f)
+        # head including the link into the deviation, since the deviation starts at node head_end of the route
+        length = distances[head_end] + self._deviation_lengths[deviation_index - 1]
 
-            f.close()
+        # tail starts with the link out of the deviation and ends before the last node of the route
+        if tail_start < len(distances) - 1:
+            length += distances[-2] - distances[tail_start - 1]
 
-        # add trip route to member
-        deviation = construct_dataclass(Deviation, deviation_dict)
-        self._deviations.append(deviation)
+        return float(length)
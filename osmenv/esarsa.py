@@ -1,100 +1,70 @@
-import time
-
-import numpy as np
-
 from osmenv.sarsa import Sarsa
 
 
 class ExpectedSarsa(Sarsa):
 
-    def __init__(self, environment, episodes=0):
-        super(ExpectedSarsa, self).__init__(environment, episodes)
-
-    def fit(self, gamma, epsilon, epsilon_decay=0.999, alpha=0.8, filename=None):
-
-        # init process monitoring variables
-        terminate = False  # terminate flag
+    _datatype = 'Expected SARSA'
 
-        episode_steps = list()
-        episode_rewards = list()
-        episode_deltas = list()
-        episode_durations = list()
-        episode_epsilons = list()
-        episode_count = 0
+    def __init__(self, environment, episodes=0, dense=False):
+        super(ExpectedSarsa, self).__init__(environment, episodes, dense)
 
-        # expected sarsa implementation
-        while terminate is False:
+    def _run_episode(self, gamma, epsilon, epsilon_decay, alpha):
 
-            # resent environment and decay epsilon
-            state, _ = self._env.reset()
-            action = self._strategy(state, epsilon)
+        # resent environment and decay epsilon
+        state, _ = self._env.reset()
+        action = self._strategy(state, epsilon)
 
-            epsilon = max(epsilon * epsilon_decay, self._epsilon_min)
+        epsilon = max(epsilon * epsilon_decay, self._epsilon_min)
 
-            # init episode monitoring variables
-            episode_step = 0
-            episode_reward = 0
-            episode_delta = 0
+        # init episode monitoring variables
+        episode_step = 0
+        episode_reward = 0
+        episode_delta = 0
 
-            episode_start = time.time()
+        profiler = self._profiler
 
-            # run each episode
-            done = False
-            while not done:
+        # run each episode
+        done = False
+        while not done:
 
-                # apply action in environment
-                next_state, reward, done, info = self._env.step(action)
+            # apply action in environment
+            start = profiler.start()
+            next_state, reward, done, info = self._env.step(action)
+            profiler.stop('step', start)
 
-                # store q value and next q value for convergence check
-                action_probability = self._action_probability(state, epsilon)
-                next_actions = self._q_table[next_state]
+            # store q value and next q value for convergence check
+            start = profiler.start()
+            action_probability = self._action_probability(state, epsilon)
+            next_actions = self._q_table[next_state]
 
-                expected_action_update = sum([a * b for a, b in zip(action_probability, next_actions)])
+            expected_action_update = sum([a * b for a, b in zip(action_probability, next_actions)])
 
-                q_value = self._q_table[state][action]
-                next_q_value = q_value + reward + alpha * \
-                               (gamma * expected_action_update - self._q_table[state][action])
+            q_actions = self._q_table[state]
 
-                self._q_table[state][action] = next_q_value
-                state = next_state
+            q_value = q_actions[action]
+            next_q_value = q_value + reward + alpha * \
+                           (gamma * expected_action_update - q_value)
 
-                episode_step += 1
-                episode_reward += (gamma ** episode_step) * reward
-                episode_delta = max(episode_delta, q_value - next_q_value)
+            q_actions[action] = next_q_value
+            state = next_state
 
-            episode_end = time.time()
+            profiler.stop('update', start)
 
-            episode_count += 1
+            episode_step += 1
+            episode_reward += (gamma ** episode_step) * reward
+            episode_delta = max(episode_delta, q_value - next_q_value)
 
-            episode_steps.append(episode_step)
-            episode_rewards.append(episode_reward)
-            episode_deltas.append(np.absolute(episode_delta))
-            episode_durations.append(episode_end - episode_start)
-            episode_epsilons.append(epsilon)
+        return episode_step, episode_reward, episode_delta, epsilon
 
-            if len(episode_deltas) > 200:
-                if self._num_episodes > 0:
-                    terminate = True if episode_count >= self._num_episodes else False
-                else:
-                    max_delta = np.max(episode_deltas[-200:])
-                    terminate = True if max_delta < 0.0001 else False
-
-        # create monitoring file name if required
-        if filename is not None:
-            self._create_monitoring_file(filename, 'Expected SARSA',
-                                         episode_count,
-                                         episode_steps,
-                                         episode_rewards,
-                                         episode_deltas,
-                                         episode_durations,
-                                         episode_epsilons)
+    def _action_probability(self, state, epsilon):
 
-        return episode_count
+        # calculate the probability for the actions of the state to be chosen, inapplicable actions are never chosen
+        valid_actions = self._valid_actions[state[0]]
 
-    def _action_probability(self, state, epsilon):
+        probability = [0.0] * self._env.action_space.n
+        for a in valid_actions:
+            probability[a] = epsilon / len(valid_actions)
 
-        # calculate the probability for the actions of the state to be chosen
-        probability = [epsilon / self._env.action_space.n] * self._env.action_space.n
-        probability[np.argmax(self._q_table[state])] += 1.0 - epsilon
+        probability[self._greedy_action(state, self._q_table[state])] += 1.0 - epsilon
 
         return probability
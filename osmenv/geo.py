@@ -1,3 +1,5 @@
+import json
+
 import geojson
 
 
@@ -7,6 +9,12 @@ class GeoJsonFile:
 
         self._features = list()
 
+    @staticmethod
+    def writer(filename, ndjson=False, precision=None):
+
+        # features are written as soon as they are added, thus large exports run in constant memory
+        return GeoJsonWriter(filename, ndjson, precision)
+
     def add_line(self, lat_lon_list, props=None):
 
         line_geometry = geojson.LineString([(e[1], e[0]) for e in lat_lon_list])
@@ -17,7 +25,20 @@ class GeoJsonFile:
         point_geometry = geojson.Point((lat_lon[1], lat_lon[0]))
         self._features.append(geojson.Feature(geometry=point_geometry, properties=props))
 
-    def save(self, filename):
+    def save(self, filename, ndjson=False, precision=None):
+
+        # features are rewritten by the streaming writer if any of its options is required
+        if ndjson or precision is not None:
+            with self.writer(filename, ndjson, precision) as writer:
+                for feature in self._features:
+                    geometry = feature['geometry']
+
+                    if geometry['type'] == 'Point':
+                        writer.add_point(geometry['coordinates'][::-1], feature['properties'])
+                    else:
+                        writer.add_line([c[::-1] for c in geometry['coordinates']], feature['properties'])
+
+            return
 
         feature_collection = geojson.FeatureCollection(self._features)
 
@@ -25,3 +46,87 @@ class GeoJsonFile:
             geojson.dump(feature_collection, f)
 
             f.close()
+
+
+class GeoJsonWriter:
+
+    def __init__(self, filename, ndjson=False, precision=None):
+
+        # either one feature collection or one feature per line (newline-delimited GeoJSON)
+        self._ndjson = ndjson
+
+        # number of decimal places of coordinates, 7 decimal places are about 1cm
+        self._precision = precision
+
+        self._file = open(filename, 'w')
+        self._count = 0
+
+        if not self._ndjson:
+            self._file.write('{"type": "FeatureCollection", "features": [\n')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def count(self):
+        return self._count
+
+    def add_line(self, lat_lon_list, props=None):
+        self.add_feature({
+            'type': 'LineString',
+            'coordinates': [self._position(e) for e in lat_lon_list]
+        }, props)
+
+    def add_point(self, lat_lon, props=None):
+        self.add_feature({
+            'type': 'Point',
+            'coordinates': self._position(lat_lon)
+        }, props)
+
+    def add_points(self, lat_lon_list, props_list=None):
+
+        # several points at once, e.g. all nodes of a network
+        if props_list is None:
+            for lat_lon in lat_lon_list:
+                self.add_point(lat_lon)
+        else:
+            for lat_lon, props in zip(lat_lon_list, props_list):
+                self.add_point(lat_lon, props)
+
+    def add_feature(self, geometry, props=None):
+
+        feature = json.dumps({
+            'type': 'Feature',
+            'geometry': geometry,
+            'properties': props if props is not None else dict()
+        })
+
+        if self._ndjson:
+            self._file.write(feature + '\n')
+        elif self._count == 0:
+            self._file.write(feature)
+        else:
+            self._file.write(',\n' + feature)
+
+        self._count += 1
+
+    def close(self):
+
+        if self._file.closed:
+            return
+
+        if not self._ndjson:
+            self._file.write('\n]}\n')
+
+        self._file.close()
+
+    def _position(self, lat_lon):
+
+        # GeoJSON positions are lon, lat
+        if self._precision is None:
+            return [float(lat_lon[1]), float(lat_lon[0])]
+
+        return [round(float(lat_lon[1]), self._precision), round(float(lat_lon[0]), self._precision)]
@@ -0,0 +1,359 @@
+import hashlib
+import heapq
+import json
+import math
+
+import numpy as np
+import pyroutelib3
+
+from pyroutelib3.err import InvalidNode
+from osmenv.spatial import EARTH_RADIUS
+from osmenv.storage import read_arrays
+from osmenv.storage import write_arrays
+
+GRAPH_CACHE_VERSION = 1
+
+
+class RoutingGraph:
+
+    def __init__(self, node_ids, coordinates, offsets, targets, costs, forbidden_moves=None, mandatory_moves=None):
+
+        # nodes are kept in the order of the routing network, coordinates are stored as lat, lon
+        self.node_ids = node_ids
+        self.coordinates = coordinates
+
+        # outgoing edges of node i are targets[offsets[i]:offsets[i + 1]], targets are node indices
+        self.offsets = offsets
+        self.targets = targets
+        self.costs = costs
+
+        # turn restrictions are rare, thus they're kept as plain python objects
+        self.forbidden_moves = forbidden_moves if forbidden_moves is not None else dict()
+        self.mandatory_moves = mandatory_moves if mandatory_moves is not None else dict()
+
+        # lookup structures, built on first use
+        self._sorted_order = None
+        self._sorted_ids = None
+        self._search_data = None
+        self._search_state = None
+
+    @classmethod
+    def from_router(cls, router):
+
+        node_ids = np.fromiter(router.rnodes.keys(), dtype=np.int64, count=len(router.rnodes))
+        coordinates = np.array(list(router.rnodes.values()), dtype=np.float64).reshape(-1, 2)
+
+        node_index = {n: i for i, n in enumerate(router.rnodes.keys())}
+
+        # flatten adjacency dicts into edge arrays, keeping the order of the edges of each node
+        offsets = np.zeros(len(node_ids) + 1, dtype=np.int64)
+        targets = list()
+        costs = list()
+
+        for i, node in enumerate(router.rnodes.keys()):
+            edges = router.routing.get(node, {})
+
+            targets += [node_index[n] for n in edges.keys()]
+            costs += list(edges.values())
+
+            offsets[i + 1] = len(targets)
+
+        return cls(node_ids, coordinates, offsets,
+                   np.array(targets, dtype=np.int64),
+                   np.array(costs, dtype=np.float64),
+                   dict(router.forbiddenMoves),
+                   dict(router.mandatoryMoves))
+
+    def to_router(self, router_type):
+
+        # create an empty router, marked as local in order to prevent downloading any tiles
+        router = pyroutelib3.Router(transport=router_type)
+        router.localFile = True
+
+        node_ids = self.node_ids.tolist()
+        router.rnodes = {n: (c[0], c[1]) for n, c in zip(node_ids, self.coordinates.tolist())}
+
+        offsets = self.offsets.tolist()
+        targets = self.node_ids[self.targets].tolist()
+        costs = self.costs.tolist()
+
+        for i, node in enumerate(node_ids):
+            if offsets[i] < offsets[i + 1]:
+                router.routing[node] = dict(zip(targets[offsets[i]:offsets[i + 1]], costs[offsets[i]:offsets[i + 1]]))
+
+        router.forbiddenMoves = {k: [list(m) for m in v] for k, v in self.forbidden_moves.items()}
+        router.mandatoryMoves = {k: list(v) for k, v in self.mandatory_moves.items()}
+
+        return router
+
+    def node_index(self, node_ids):
+
+        # position of each node ID within the graph, -1 for unknown nodes
+        if self._sorted_order is None:
+            self._sorted_order = np.argsort(self.node_ids, kind='stable')
+            self._sorted_ids = np.asarray(self.node_ids)[self._sorted_order]
+
+        node_ids = np.asarray(node_ids, dtype=np.int64)
+
+        positions = np.minimum(np.searchsorted(self._sorted_ids, node_ids), len(self._sorted_ids) - 1)
+        found = self._sorted_ids[positions] == node_ids
+
+        return np.where(found, self._sorted_order[positions], -1)
+
+    def route(self, start, end, blocked_nodes=None, blocked_edges=None):
+
+        # A* search over the edge arrays, start, end and blocked items are given as node IDs
+        start_index, end_index = self.node_index([start, end]).tolist()
+
+        if start_index < 0:
+            raise InvalidNode('Start node ({0}) doesn\'t exist in graph'.format(start))
+
+        if end_index < 0:
+            raise InvalidNode('End node ({0}) doesn\'t exist in graph'.format(end))
+
+        if start_index == end_index:
+            return 'success', [start]
+
+        offsets, targets, costs, coordinates, forbidden_moves, mandatory_moves = self._get_search_data()
+
+        blocked_nodes = self._blocked_node_indices(blocked_nodes)
+        blocked_edges = self._blocked_edge_indices(blocked_edges)
+
+        # search state preallocated once per graph, only the nodes reached by this search are reset afterwards
+        distance, parent, heuristic = self._get_search_state()
+        touched = [start_index]
+
+        try:
+            return self._search(start_index, end_index, blocked_nodes, blocked_edges, offsets, targets, costs,
+                                coordinates, forbidden_moves, mandatory_moves, distance, parent, heuristic, touched)
+        finally:
+            for i in touched:
+                distance[i] = math.inf
+                parent[i] = -1
+                heuristic[i] = -1.0
+
+    def _search(self, start_index, end_index, blocked_nodes, blocked_edges, offsets, targets, costs, coordinates,
+                forbidden_moves, mandatory_moves, distance, parent, heuristic, touched):
+
+        # the distance to the end is only calculated for nodes put into the queue, by the haversine formula of
+        # pyroutelib3.distHaversine on coordinates converted into radians once per graph
+        latitudes, longitudes, cos_latitudes = coordinates
+        end_lat, end_lon, end_cos_lat = latitudes[end_index], longitudes[end_index], cos_latitudes[end_index]
+
+        asin, sin, sqrt = math.asin, math.sin, math.sqrt
+
+        force_next = dict()
+
+        searched = 0
+        distance[start_index] = 0.0
+        queue = [(0.0, 0.0, start_index)]
+
+        while queue:
+
+            _, cost_to, current = heapq.heappop(queue)
+
+            # skip outdated queue items
+            if cost_to > distance[current]:
+                continue
+
+            searched += 1
+            if searched > pyroutelib3.SEARCH_LIMIT:
+                return 'gave_up', []
+
+            if current == end_index:
+                return 'success', self._node_sequence(parent, end_index)
+
+            # a blocked node may be reached, but the route can't continue from there
+            if current in blocked_nodes:
+                continue
+
+            current_parent = parent[current]
+            current_force = force_next.get(current)
+
+            for k in range(offsets[current], offsets[current + 1]):
+                to_node = targets[k]
+                to_cost = cost_to + costs[k]
+
+                # ignore non-traversible and blocked edges as well as turn-arounds at nodes (no a-b-a)
+                if costs[k] <= 0 or to_node == current_parent or (current, to_node) in blocked_edges:
+                    continue
+
+                # check if a mandatory move is performed and is followed
+                if current_force and current_force[0] != to_node:
+                    continue
+
+                if to_cost >= distance[to_node]:
+                    continue
+
+                # check if we run into a restriction
+                if (current_parent, current, to_node) in forbidden_moves and \
+                        self._is_forbidden(parent, current, to_node, forbidden_moves):
+                    continue
+
+                if parent[to_node] < 0 and to_node != start_index:
+                    touched.append(to_node)
+
+                distance[to_node] = to_cost
+                parent[to_node] = current
+
+                # update mandatory move, if a new one is started
+                to_force = current_force[1:] if current_force else None
+                if not to_force:
+                    to_force = mandatory_moves.get((current, to_node))
+
+                if to_force:
+                    force_next[to_node] = list(to_force)
+                else:
+                    force_next.pop(to_node, None)
+
+                if heuristic[to_node] < 0:
+                    heuristic[to_node] = asin(sqrt(
+                        (sin((end_lat - latitudes[to_node]) * 0.5) ** 2) +
+                        (cos_latitudes[to_node] * end_cos_lat * (sin((end_lon - longitudes[to_node]) * 0.5) ** 2))
+                    )) * 2 * EARTH_RADIUS
+
+                heapq.heappush(queue, (to_cost + heuristic[to_node], to_cost, to_node))
+
+        return 'no_route', []
+
+    def _get_search_data(self):
+
+        # plain lists are much faster than arrays when accessed element wise
+        if self._search_data is None:
+            # turn restrictions are keyed by node indices as well
+            node_ids = sorted({n for v in self.forbidden_moves.values() for m in v for n in m} |
+                              {n for k, v in self.mandatory_moves.items() for n in list(k) + list(v)})
+
+            index = dict(zip(node_ids, self.node_index(node_ids).tolist())) if node_ids else dict()
+
+            forbidden_moves = dict()
+            for v in self.forbidden_moves.values():
+                for move in v:
+                    move = [index[n] for n in move]
+                    if min(move) >= 0:
+                        forbidden_moves.setdefault(tuple(move[-3:]), []).append(move)
+
+            mandatory_moves = dict()
+            for k, v in self.mandatory_moves.items():
+                move = [index[n] for n in k] + [index[n] for n in v]
+                if min(move) >= 0:
+                    mandatory_moves[tuple(move[:2])] = move[2:]
+
+            self._search_data = (
+                np.asarray(self.offsets).tolist(),
+                np.asarray(self.targets).tolist(),
+                np.asarray(self.costs).tolist(),
+                self._search_coordinates(),
+                forbidden_moves,
+                mandatory_moves
+            )
+
+        return self._search_data
+
+    def _search_coordinates(self):
+
+        # latitudes and longitudes in radians as well as the cosine of each latitude
+        coordinates = np.asarray(self.coordinates).tolist()
+
+        latitudes = [math.radians(c[0]) for c in coordinates]
+        longitudes = [math.radians(c[1]) for c in coordinates]
+
+        return latitudes, longitudes, [math.cos(lat) for lat in latitudes]
+
+    def _get_search_state(self):
+
+        # distance, parent and distance to the end of each node, a route search leaves them as they were before
+        if self._search_state is None:
+            num_nodes = len(self.offsets) - 1
+            self._search_state = ([math.inf] * num_nodes, [-1] * num_nodes, [-1.0] * num_nodes)
+
+        return self._search_state
+
+    def _blocked_node_indices(self, blocked_nodes):
+
+        if not blocked_nodes:
+            return set()
+
+        return {i for i in self.node_index(list(blocked_nodes)).tolist() if i >= 0}
+
+    def _blocked_edge_indices(self, blocked_edges):
+
+        if not blocked_edges:
+            return set()
+
+        blocked_edges = list(blocked_edges)
+        sources = self.node_index([a for a, _ in blocked_edges]).tolist()
+        targets = self.node_index([b for _, b in blocked_edges]).tolist()
+
+        return {(a, b) for a, b in zip(sources, targets) if a >= 0 and b >= 0}
+
+    def _node_sequence(self, parent, end_index):
+
+        indices = list()
+
+        current = end_index
+        while current >= 0:
+            indices.append(current)
+            current = parent[current]
+
+        return np.asarray(self.node_ids)[indices[::-1]].tolist()
+
+    @staticmethod
+    def _is_forbidden(parent, current, to_node, forbidden_moves):
+
+        for move in forbidden_moves[(parent[current], current, to_node)]:
+
+            # compare the end of the route found so far with the forbidden move
+            route_end = [to_node]
+
+            node = current
+            while len(route_end) < len(move) and node >= 0:
+                route_end.append(node)
+                node = parent[node]
+
+            if route_end[::-1] == move:
+                return True
+
+        return False
+
+    def save(self, filename):
+
+        write_arrays(filename, {
+            'node_ids': self.node_ids,
+            'coordinates': self.coordinates,
+            'offsets': self.offsets,
+            'targets': self.targets,
+            'costs': self.costs
+        }, {
+            'type': 'routing-graph',
+            'forbidden_moves': [[list(k), v] for k, v in self.forbidden_moves.items()],
+            'mandatory_moves': [[list(k), v] for k, v in self.mandatory_moves.items()]
+        })
+
+    @classmethod
+    def load(cls, filename):
+
+        header, arrays = read_arrays(filename)
+
+        if header.get('type') != 'routing-graph':
+            raise RuntimeError('invalid file {0}, expected routing graph'.format(filename))
+
+        return cls(arrays['node_ids'], arrays['coordinates'], arrays['offsets'], arrays['targets'], arrays['costs'],
+                   {tuple(k): v for k, v in header['forbidden_moves']},
+                   {tuple(k): v for k, v in header['mandatory_moves']})
+
+
+def graph_cache_key(osm_filename, router_type):
+
+    # the graph depends on the OSM data as well as on the weights and access rules of the router
+    key = hashlib.sha256()
+    key.update(str(GRAPH_CACHE_VERSION).encode('utf-8'))
+    key.update(json.dumps(router_type, sort_keys=True).encode('utf-8'))
+
+    with open(osm_filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            key.update(chunk)
+
+        f.close()
+
+    return key.hexdigest()
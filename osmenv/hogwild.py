@@ -0,0 +1,205 @@
+import ctypes
+import multiprocessing
+import os
+import queue
+import time
+
+import numpy as np
+
+from collections import deque
+from osmenv.algorithm import CONVERGENCE_EPISODES
+from osmenv.esarsa import ExpectedSarsa
+from osmenv.metrics import create_metrics_sink
+from osmenv.profiling import NULL_PROFILER
+from osmenv.qlearning import QLearning
+from osmenv.sarsa import Sarsa
+
+# number of episodes a worker runs for one task and number of tasks queued for each worker
+CHUNK_SIZE = 32
+TASKS_PER_WORKER = 2
+
+# seconds to wait for results before checking whether all workers are still alive
+POLL_INTERVAL = 1.0
+
+
+def _run_worker(algorithm, q_buffer, tasks, results, gamma, epsilon_decay, alpha, seed):
+
+    # each worker has its own random generators, the q-table lives in shared memory and is updated without locks
+    np.random.seed(seed)
+    algorithm._env.seed(seed)
+
+    algorithm._profiler = NULL_PROFILER
+    algorithm._q_table = np.frombuffer(q_buffer, dtype=np.float64).reshape(algorithm._q_shape())
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            break
+
+        # run a chunk of episodes starting with the epsilon given by the coordinator
+        epsilon, count = task
+        records = np.zeros((count, 5))
+
+        for i in range(count):
+            episode_start = time.time()
+            episode_step, episode_reward, episode_delta, epsilon = algorithm._run_episode(gamma, epsilon,
+                                                                                          epsilon_decay, alpha)
+            episode_end = time.time()
+
+            records[i] = episode_step, episode_reward, np.absolute(episode_delta), episode_end - episode_start, epsilon
+
+        results.put(records)
+
+
+class HogwildTemporalDifferenceAlgorithm:
+
+    def fit(self, gamma, epsilon, epsilon_decay=0.999, alpha=0.8, filename=None, metrics=None):
+
+        # episode records of all workers are streamed into the metrics sink by the coordinator
+        if metrics is None:
+            metrics = create_metrics_sink(filename, self._datatype)
+
+        # workers inherit the loaded environment when forked, elsewhere it is transferred once per worker
+        if 'fork' in multiprocessing.get_all_start_methods():
+            context = multiprocessing.get_context('fork')
+        else:
+            context = multiprocessing.get_context()
+
+        # dense q-table in shared memory, all workers update it concurrently
+        shape = self._q_shape()
+        q_buffer = context.RawArray(ctypes.c_double, int(np.prod(shape)))
+
+        q_table = np.frombuffer(q_buffer, dtype=np.float64).reshape(shape)
+        q_table[:] = self._q_array()
+
+        tasks = context.Queue()
+        results = context.Queue()
+
+        # worker seeds are drawn from the global generator, thus seeding works as before
+        seeds = np.random.randint(0, 2 ** 31 - 1, self._processes)
+
+        workers = [context.Process(target=_run_worker, args=(self, q_buffer, tasks, results, gamma, epsilon_decay,
+                                                             alpha, int(seed)), daemon=True) for seed in seeds]
+
+        for worker in workers:
+            worker.start()
+
+        # the coordinator decays epsilon for each episode handed out, like the episodes ran one after another
+        epsilon_min = getattr(self, '_epsilon_min', 0.0)
+        max_episodes = max(self._num_episodes, CONVERGENCE_EPISODES + 1) if self._num_episodes > 0 else None
+
+        episodes_issued = 0
+        tasks_pending = 0
+
+        def issue_task():
+
+            nonlocal epsilon, episodes_issued, tasks_pending
+
+            count = CHUNK_SIZE
+            if max_episodes is not None:
+                count = min(count, max_episodes - episodes_issued)
+
+            if count <= 0:
+                return
+
+            tasks.put((epsilon, count))
+            epsilon = max(epsilon * epsilon_decay ** count, epsilon_min)
+
+            episodes_issued += count
+            tasks_pending += 1
+
+        terminate = False  # terminate flag
+
+        episode_deltas = deque(maxlen=CONVERGENCE_EPISODES)
+        episode_count = 0
+
+        try:
+            for _ in range(TASKS_PER_WORKER * len(workers)):
+                issue_task()
+
+            with metrics:
+                while terminate is False:
+
+                    start = self._profiler.start()
+                    records = self._receive(results, workers)
+                    self._profiler.stop('hogwild_wait', start)
+
+                    tasks_pending -= 1
+
+                    for episode_step, episode_reward, episode_delta, duration, episode_epsilon in records.tolist():
+
+                        episode_count += 1
+
+                        self._profiler.count('episodes')
+                        self._profiler.count('steps', int(episode_step))
+                        episode_deltas.append(episode_delta)
+
+                        metrics.write(episode_count, int(episode_step), episode_reward, episode_delta, duration,
+                                      episode_epsilon)
+
+                        terminate = self._converged(episode_count, episode_deltas)
+
+                        if terminate:
+                            break
+
+                    if terminate is False:
+                        issue_task()
+
+                        # episodes are limited and all of them are finished
+                        if tasks_pending == 0:
+                            break
+        finally:
+
+            # stop workers, tasks already started are finished and their results dropped
+            for _ in workers:
+                tasks.put(None)
+
+            while tasks_pending > 0 and any(w.is_alive() for w in workers):
+                try:
+                    results.get(timeout=POLL_INTERVAL)
+                    tasks_pending -= 1
+                except queue.Empty:
+                    pass
+
+            for worker in workers:
+                worker.join()
+
+        # write results back into the q-table
+        self._set_q_array(np.array(q_table))
+
+        return episode_count
+
+    @staticmethod
+    def _receive(results, workers):
+
+        # wait for the next chunk of episodes, fail if a worker died meanwhile
+        while True:
+            try:
+                return results.get(timeout=POLL_INTERVAL)
+            except queue.Empty:
+                if not all(w.is_alive() for w in workers):
+                    raise RuntimeError('worker process terminated unexpectedly')
+
+
+class HogwildQLearning(HogwildTemporalDifferenceAlgorithm, QLearning):
+
+    def __init__(self, environment, episodes=0, dense=False, processes=None):
+        super(HogwildQLearning, self).__init__(environment, episodes, dense)
+
+        self._processes = processes if processes is not None else os.cpu_count()
+
+
+class HogwildSarsa(HogwildTemporalDifferenceAlgorithm, Sarsa):
+
+    def __init__(self, environment, episodes=0, dense=False, processes=None):
+        super(HogwildSarsa, self).__init__(environment, episodes, dense)
+
+        self._processes = processes if processes is not None else os.cpu_count()
+
+
+class HogwildExpectedSarsa(HogwildTemporalDifferenceAlgorithm, ExpectedSarsa):
+
+    def __init__(self, environment, episodes=0, dense=False, processes=None):
+        super(HogwildExpectedSarsa, self).__init__(environment, episodes, dense)
+
+        self._processes = processes if processes is not None else os.cpu_count()
@@ -0,0 +1,91 @@
+import numpy as np
+
+from osmenv.spatial import NodeIndex
+
+# incidents more than 130m away from the closest node can't be on any route, see OfflineRouter.route_contains_point
+MAX_DISTANCE = 0.130
+
+
+class ImpactIndex:
+
+    def __init__(self, routes, scenarios, node_index, max_distance=MAX_DISTANCE):
+
+        # incident coordinates are snapped to the closest node of the spatial index
+        self._node_index = node_index
+        self._max_distance = max_distance
+
+        # routes passing each node, routes of node nodes[i] are route_indices[offsets[i]:offsets[i + 1]]
+        route_nodes = [np.unique(np.asarray(r.nodes, dtype=np.int64)) for r in routes]
+
+        nodes = np.concatenate(route_nodes) if len(route_nodes) > 0 else np.zeros(0, dtype=np.int64)
+        route_indices = np.repeat(np.arange(len(route_nodes), dtype=np.int64), [len(n) for n in route_nodes])
+
+        order = np.lexsort((route_indices, nodes))
+
+        self._nodes, counts = np.unique(nodes[order], return_counts=True)
+        self._offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        self._route_indices = route_indices[order]
+
+        # scenarios are identified by their blocked node
+        self._scenario_nodes = np.asarray(scenarios, dtype=np.int64)
+        self._scenario_order = np.argsort(self._scenario_nodes, kind='stable')
+
+    @classmethod
+    def from_environment(cls, env, max_distance=MAX_DISTANCE):
+
+        env = env.unwrapped
+
+        # environments loaded from a bundle know the nodes of their routes and deviations only, thus incidents are
+        # snapped to the closest of them
+        node_ids, coordinates = env.network_nodes()
+
+        return cls(env.routes, env.scenarios, NodeIndex(node_ids, coordinates), max_distance)
+
+    def query(self, coordinates):
+
+        # snap all incident coordinates at once, incidents too far away from any node affect nothing
+        nodes, distances = self._node_index.nearest_many(np.asarray(coordinates, dtype=np.float64).reshape(-1, 2))
+        nodes = np.asarray(nodes, dtype=np.int64)
+        valid = distances <= self._max_distance
+
+        # affected routes of incident i are routes[route_offsets[i]:route_offsets[i + 1]]
+        route_offsets, routes = self._lookup(self._nodes, self._offsets, self._route_indices, nodes, valid)
+
+        # affected scenario of each incident, -1 if the incident doesn't block a node of any scenario
+        scenarios = np.full(len(nodes), -1, dtype=np.int64)
+
+        if len(self._scenario_nodes) > 0:
+            sorted_nodes = self._scenario_nodes[self._scenario_order]
+            positions = np.minimum(np.searchsorted(sorted_nodes, nodes), len(sorted_nodes) - 1)
+
+            found = valid & (sorted_nodes[positions] == nodes)
+            scenarios[found] = self._scenario_order[positions[found]]
+
+        return nodes, distances, route_offsets, routes, scenarios
+
+    def affected_routes(self, coordinates):
+
+        # route indices affected by each incident as separate arrays
+        _, _, route_offsets, routes, _ = self.query(coordinates)
+
+        return np.split(routes, route_offsets[1:-1])
+
+    @staticmethod
+    def _lookup(keys, offsets, values, queries, valid):
+
+        if len(keys) == 0:
+            return np.zeros(len(queries) + 1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+        positions = np.minimum(np.searchsorted(keys, queries), len(keys) - 1)
+        found = valid & (keys[positions] == queries)
+
+        starts = np.where(found, offsets[positions], 0)
+        counts = np.where(found, offsets[positions + 1] - offsets[positions], 0)
+
+        # gather the values of all queries at once
+        result_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        total = int(result_offsets[-1])
+
+        value_positions = np.repeat(starts - result_offsets[:-1], counts) + np.arange(total)
+
+        return result_offsets, values[value_positions]
@@ -0,0 +1,299 @@
+import time
+
+import numpy as np
+
+from osmenv.algorithm import CONVERGENCE_DELTA
+from osmenv.algorithm import CONVERGENCE_EPISODES
+from osmenv.esarsa import ExpectedSarsa
+from osmenv.metrics import create_metrics_sink
+from osmenv.qlearning import QLearning
+from osmenv.sarsa import Sarsa
+
+# numba is optional, without it the same kernel runs as plain python
+try:
+    from numba import njit
+
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+
+        return lambda function: function
+
+Q_LEARNING = 0
+SARSA = 1
+EXPECTED_SARSA = 2
+
+# number of random numbers and episodes handled by one kernel call
+STREAM_SIZE = 1 << 18
+EPISODES_PER_CALL = 4096
+
+
+@njit(cache=True)
+def _argmax(q_actions, mask):
+
+    # first maximum among the applicable actions, like np.argmax
+    best = -1
+    for a in range(q_actions.shape[0]):
+        if mask[a] and (best < 0 or q_actions[a] > q_actions[best]):
+            best = a
+
+    return best
+
+
+@njit(cache=True)
+def _max(q_actions, mask):
+    return q_actions[_argmax(q_actions, mask)]
+
+
+@njit(cache=True)
+def _nth_action(mask, n):
+
+    # n-th applicable action
+    for a in range(mask.shape[0]):
+        if mask[a]:
+            if n == 0:
+                return a
+
+            n -= 1
+
+    return -1
+
+
+@njit(cache=True)
+def _is_zero(q_actions):
+    return np.sum(q_actions) == 0
+
+
+@njit(cache=True)
+def _epsilon_greedy(q_actions, mask, epsilon, stream, position):
+
+    # epsilon-greedy strategy of q-learning
+    if stream[position] < epsilon or _is_zero(q_actions):
+        return _nth_action(mask, int(stream[position + 1] * np.sum(mask))), position + 2
+
+    return _argmax(q_actions, mask), position + 1
+
+
+@njit(cache=True)
+def _n_epsilon_greedy(q_actions, mask, epsilon, stream, position):
+
+    # n-epsilon-greedy strategy of sarsa, the top 3 actions and all unvisited actions among the applicable ones
+    # are explored, an action being both is counted twice, like the list concatenation of the python implementation
+    if stream[position] < epsilon or _is_zero(q_actions):
+        n = 3
+        num_actions = q_actions.shape[0]
+        num_valid = np.sum(mask)
+
+        # inapplicable actions are sorted in front of all others
+        top_actions = np.argsort(np.where(mask, q_actions, -np.inf), kind='mergesort')[num_actions - min(n, num_valid):]
+
+        num_zero = 0
+        for a in range(num_actions):
+            if mask[a] and q_actions[a] == 0.0:
+                num_zero += 1
+
+        choice = int(stream[position + 1] * (top_actions.shape[0] + num_zero))
+        if choice < top_actions.shape[0]:
+            return top_actions[choice], position + 2
+
+        choice -= top_actions.shape[0]
+        for a in range(num_actions):
+            if mask[a] and q_actions[a] == 0.0:
+                if choice == 0:
+                    return a, position + 2
+
+                choice -= 1
+
+    return _argmax(q_actions, mask), position + 1
+
+
+@njit(cache=True)
+def run_episodes(algorithm, q_table, rewards, terminated, action_mask, max_steps, stream, gamma, epsilon,
+                 epsilon_decay, epsilon_min, alpha, num_episodes, episode_count, window, out_steps, out_rewards,
+                 out_deltas, out_epsilons):
+
+    # runs episodes until converged or until the random stream or the output arrays are exhausted
+    # returns the number of episodes run, the current epsilon and whether training has converged
+    num_routes, num_actions, num_scenarios = rewards.shape
+    required = 2 + 2 * (max_steps + 1)
+
+    position = 0
+    episodes = 0
+
+    while episodes < out_steps.shape[0] and position + required <= stream.shape[0]:
+
+        # reset environment to random route and scenario
+        r = int(stream[position] * num_routes)
+        s = int(stream[position + 1] * num_scenarios)
+        d = 0
+        mask = action_mask[r]
+        position += 2
+
+        # decay epsilon, sarsa chooses its first action before decaying
+        action = 0
+        if algorithm == Q_LEARNING:
+            epsilon *= epsilon_decay
+        else:
+            action, position = _n_epsilon_greedy(q_table[r, d, s], mask, epsilon, stream, position)
+            epsilon = max(epsilon * epsilon_decay, epsilon_min)
+
+        episode_step = 0
+        episode_reward = 0.0
+        episode_delta = 0.0
+
+        done = False
+        while not done:
+
+            q_actions = q_table[r, d, s]
+
+            if algorithm == Q_LEARNING:
+                action, position = _epsilon_greedy(q_actions, mask, epsilon, stream, position)
+
+            # the action leads into the deviation state, outcome is known in advance
+            reward = rewards[r, action, s]
+            episode_step += 1
+
+            done = terminated[r, action, s] or episode_step >= max_steps
+
+            next_q_actions = q_table[r, action, s]
+
+            # the route and thus the applicable actions remain the same in the next state
+            if algorithm == Q_LEARNING:
+                target = _max(next_q_actions, mask)
+            elif algorithm == SARSA:
+                next_action, position = _n_epsilon_greedy(next_q_actions, mask, epsilon, stream, position)
+                target = next_q_actions[next_action]
+            else:
+                best = _argmax(q_actions, mask)
+                num_valid = np.sum(mask)
+                target = 0.0
+                for a in range(num_actions):
+                    if not mask[a]:
+                        continue
+
+                    probability = epsilon / num_valid
+                    if a == best:
+                        probability += 1.0 - epsilon
+
+                    target += probability * next_q_actions[a]
+
+            q_value = q_actions[action]
+            next_q_value = q_value + reward + alpha * (gamma * target - q_value)
+
+            q_actions[action] = next_q_value
+            d = action
+
+            episode_reward += (gamma ** episode_step) * reward
+            episode_delta = max(episode_delta, q_value - next_q_value)
+
+        out_steps[episodes] = episode_step
+        out_rewards[episodes] = episode_reward
+        out_deltas[episodes] = abs(episode_delta)
+        out_epsilons[episodes] = epsilon
+
+        episodes += 1
+        episode_count += 1
+
+        window[(episode_count - 1) % window.shape[0]] = abs(episode_delta)
+
+        # same convergence criteria as the python implementation
+        if episode_count > window.shape[0]:
+            if num_episodes > 0:
+                if episode_count >= num_episodes:
+                    return episodes, epsilon, True
+            elif np.max(window) < CONVERGENCE_DELTA:
+                return episodes, epsilon, True
+
+    return episodes, epsilon, False
+
+
+class KernelTemporalDifferenceAlgorithm:
+
+    _kernel_algorithm = None
+
+    def fit(self, gamma, epsilon, epsilon_decay=0.999, alpha=0.8, filename=None, metrics=None):
+
+        if metrics is None:
+            metrics = create_metrics_sink(filename, self._datatype)
+
+        env = self._env.unwrapped
+        if self._env.spec is None or self._env.spec.max_episode_steps is None:
+            raise RuntimeError('kernel training requires an environment with a step limit')
+
+        max_steps = self._env.spec.max_episode_steps
+        epsilon_min = getattr(self, '_epsilon_min', 0.0)
+
+        # kernel works on a dense q-table and on the precomputed outcomes of the environment
+        q_table = np.ascontiguousarray(self._q_array(), dtype=np.float64)
+        rewards = np.ascontiguousarray(env.reward_table, dtype=np.float64)
+        terminated = np.ascontiguousarray(env.terminated_table, dtype=np.bool_)
+        action_mask = np.ascontiguousarray(self._action_mask, dtype=np.bool_)
+
+        window = np.zeros(CONVERGENCE_EPISODES, dtype=np.float64)
+
+        out_steps = np.zeros(EPISODES_PER_CALL, dtype=np.int64)
+        out_rewards = np.zeros(EPISODES_PER_CALL, dtype=np.float64)
+        out_deltas = np.zeros(EPISODES_PER_CALL, dtype=np.float64)
+        out_epsilons = np.zeros(EPISODES_PER_CALL, dtype=np.float64)
+
+        episode_count = 0
+        terminate = False
+
+        with metrics:
+            while terminate is False:
+
+                # random numbers are drawn in advance from the global generator, thus seeding works as before
+                stream = np.random.random(max(STREAM_SIZE, 4 * (max_steps + 2)))
+
+                start = time.time()
+                episodes, epsilon, terminate = run_episodes(self._kernel_algorithm, q_table, rewards, terminated,
+                                                            action_mask, max_steps, stream, gamma, epsilon,
+                                                            epsilon_decay, epsilon_min, alpha, self._num_episodes,
+                                                            episode_count, window, out_steps, out_rewards,
+                                                            out_deltas, out_epsilons)
+                end = time.time()
+
+                terminate = bool(terminate)
+
+                # episodes of a kernel call are not timed on their own, their mean duration is recorded
+                for i in range(episodes):
+                    metrics.write(episode_count + i + 1, int(out_steps[i]), float(out_rewards[i]),
+                                  float(out_deltas[i]), (end - start) / episodes, float(out_epsilons[i]))
+
+                self._profiler.count('episodes', episodes)
+                self._profiler.count('steps', int(np.sum(out_steps[:episodes])))
+
+                episode_count += episodes
+
+        # write results back into the q-table
+        self._set_q_array(q_table)
+
+        return episode_count
+
+
+class KernelQLearning(KernelTemporalDifferenceAlgorithm, QLearning):
+
+    _kernel_algorithm = Q_LEARNING
+
+    def __init__(self, environment, episodes=0, dense=False):
+        super(KernelQLearning, self).__init__(environment, episodes, dense)
+
+
+class KernelSarsa(KernelTemporalDifferenceAlgorithm, Sarsa):
+
+    _kernel_algorithm = SARSA
+
+    def __init__(self, environment, episodes=0, dense=False):
+        super(KernelSarsa, self).__init__(environment, episodes, dense)
+
+
+class KernelExpectedSarsa(KernelTemporalDifferenceAlgorithm, ExpectedSarsa):
+
+    _kernel_algorithm = EXPECTED_SARSA
+
+    def __init__(self, environment, episodes=0, dense=False):
+        super(KernelExpectedSarsa, self).__init__(environment, episodes, dense)
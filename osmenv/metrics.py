@@ -0,0 +1,207 @@
+import abc
+import os
+
+import numpy as np
+import pandas as pd
+
+COLUMNS = ['episode', 'steps', 'reward', 'delta', 'duration', 'epsilon']
+
+
+class MetricsSink(abc.ABC):
+
+    def __init__(self, chunk_size=1000, every=1, aggregate=False):
+
+        # records are buffered in chunks of columns and written once a chunk is full
+        self._chunk_size = max(chunk_size, 1)
+        self._chunk = {c: list() for c in COLUMNS}
+
+        # only every n-th episode is recorded, either as it is or aggregated with the episodes before
+        self._every = max(every, 1)
+        self._aggregate = aggregate
+        self._group = {c: list() for c in COLUMNS}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def write(self, episode, steps, reward, delta, duration, epsilon):
+
+        record = (episode, steps, reward, delta, duration, epsilon)
+
+        if self._every == 1:
+            self._append(record)
+        elif self._aggregate:
+            for c, v in zip(COLUMNS, record):
+                self._group[c].append(v)
+
+            if len(self._group['episode']) >= self._every:
+                self._append(self._reduce_group())
+        elif episode % self._every == 0:
+            self._append(record)
+
+    def flush(self):
+
+        if len(self._chunk['episode']) == 0:
+            return
+
+        self._write_chunk(pd.DataFrame(self._chunk, columns=COLUMNS))
+        self._chunk = {c: list() for c in COLUMNS}
+
+    def close(self):
+
+        # a partial group of episodes at the end of the run is aggregated as well
+        if len(self._group['episode']) > 0:
+            self._append(self._reduce_group())
+
+        self.flush()
+        self._close()
+
+    def _append(self, record):
+
+        for c, v in zip(COLUMNS, record):
+            self._chunk[c].append(v)
+
+        if len(self._chunk['episode']) >= self._chunk_size:
+            self.flush()
+
+    def _reduce_group(self):
+
+        # steps, rewards and durations are averaged, the largest delta is kept since it decides about convergence
+        record = (
+            self._group['episode'][-1],
+            float(np.mean(self._group['steps'])),
+            float(np.mean(self._group['reward'])),
+            float(np.max(self._group['delta'])),
+            float(np.mean(self._group['duration'])),
+            self._group['epsilon'][-1]
+        )
+
+        self._group = {c: list() for c in COLUMNS}
+
+        return record
+
+    @abc.abstractmethod
+    def _write_chunk(self, df):
+        pass
+
+    def _close(self):
+        pass
+
+
+class NullSink(MetricsSink):
+
+    def write(self, episode, steps, reward, delta, duration, epsilon):
+        pass
+
+    def _write_chunk(self, df):
+        pass
+
+
+class CsvSink(MetricsSink):
+
+    def __init__(self, filename, chunk_size=1000, every=1, aggregate=False, start_episode=0):
+        super(CsvSink, self).__init__(chunk_size, every, aggregate)
+
+        self._filename = filename
+
+        # a resumed run keeps the records up to the episode it starts from, records of episodes run after the
+        # checkpoint are recorded again
+        if start_episode > 0 and os.path.exists(self._filename):
+            df = pd.read_csv(self._filename)
+            df[df['episode'] <= start_episode].to_csv(self._filename, index=False)
+
+            return
+
+        # write header immediately, thus the file is valid even if the run dies before the first chunk
+        pd.DataFrame(columns=COLUMNS).to_csv(self._filename, index=False)
+
+    def _write_chunk(self, df):
+        df.to_csv(self._filename, mode='a', header=False, index=False)
+
+
+class ParquetSink(MetricsSink):
+
+    def __init__(self, filename, chunk_size=1000, every=1, aggregate=False, start_episode=0):
+        super(ParquetSink, self).__init__(chunk_size, every, aggregate)
+
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError('parquet metrics require pyarrow to be installed')
+
+        self._pa = pyarrow
+        self._schema = pyarrow.schema([
+            ('episode', pyarrow.int64()),
+            ('steps', pyarrow.float64()),
+            ('reward', pyarrow.float64()),
+            ('delta', pyarrow.float64()),
+            ('duration', pyarrow.float64()),
+            ('epsilon', pyarrow.float64())
+        ])
+
+        # parquet files can't be appended, a resumed run rewrites the records up to the episode it starts from
+        df = None
+        if start_episode > 0 and os.path.exists(filename):
+            df = pd.read_parquet(filename)
+            df = df[df['episode'] <= start_episode]
+
+        # each chunk becomes a row group of the file
+        self._writer = pyarrow.parquet.ParquetWriter(filename, self._schema)
+
+        if df is not None and len(df) > 0:
+            self._write_chunk(df)
+
+    def _write_chunk(self, df):
+        self._writer.write_table(self._pa.Table.from_pandas(df, schema=self._schema, preserve_index=False))
+
+    def _close(self):
+        self._writer.close()
+
+
+class ExcelSink(CsvSink):
+
+    def __init__(self, filename, sheet_name, chunk_size=1000, every=1, aggregate=False, start_episode=0):
+
+        # records are streamed into a CSV file next to the excel file, which is exported when the run is finished
+        super(ExcelSink, self).__init__(os.path.splitext(filename)[0] + '.csv', chunk_size, every, aggregate,
+                                        start_episode)
+
+        self._excel_filename = filename
+        self._sheet_name = sheet_name
+
+    def _close(self):
+        export_excel(self._filename, self._excel_filename, self._sheet_name)
+
+
+def create_metrics_sink(filename, datatype, chunk_size=1000, every=1, aggregate=False, start_episode=0):
+
+    # sink type is chosen by the file extension
+    if filename is None:
+        return NullSink()
+    elif filename.endswith('.parquet'):
+        return ParquetSink(filename, chunk_size, every, aggregate, start_episode)
+    elif filename.endswith('.xlsx'):
+        return ExcelSink(filename, datatype, chunk_size, every, aggregate, start_episode)
+    else:
+        return CsvSink(filename, chunk_size, every, aggregate, start_episode)
+
+
+def read_metrics(filename):
+
+    if filename.endswith('.parquet'):
+        return pd.read_parquet(filename)
+    else:
+        return pd.read_csv(filename)
+
+
+def export_excel(source_filename, filename, sheet_name):
+
+    df = read_metrics(source_filename)
+
+    writer = pd.ExcelWriter(filename, engine='xlsxwriter')
+    df.to_excel(writer, sheet_name=sheet_name, index=False)
+
+    writer.close()
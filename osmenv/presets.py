@@ -0,0 +1,84 @@
+import gym
+
+from osmenv.catalog import load_catalog
+
+OSM_FILE = 'data/network.osm.pbf'
+CACHE_DIR = 'cache'
+
+# router type optimized for bus routing network
+ROUTER_TYPE = {
+    'name': 'bus',
+    'weights': {
+        'motorway': 0.5,
+        'trunk': 0.75,
+        'primary': 1.0,
+        'secondary': 1.0,
+        'tertiary': 1.0,
+        'unclassified': 1.0,
+        'residential': 1.0,
+        'living_street': 1.0,
+        'pedestrian': 1.0,
+        'footway': 1.0
+    },
+    'access': ['access', 'walk', 'psv']
+}
+
+ROUTE_FILES = [
+    'data/city2.json',
+    'data/land743.json',
+    'data/land744.json'
+]
+
+DEVIATION_FILES = [
+    'data/city2_dev1.json',
+    'data/city2_dev2.json',
+    'data/city2_dev3.json',
+    'data/city2_dev4.json',
+    'data/land743_dev1.json',
+    'data/land743_dev2.json',
+    'data/land744_dev1.json',
+    'data/land744_dev2.json',
+    'data/land744_dev3.json'
+]
+
+FULL_ROUTE_FILES = ROUTE_FILES + [
+    'data/village715.json'
+]
+
+FULL_DEVIATION_FILES = DEVIATION_FILES + [
+    'data/village715_dev1.json',
+    'data/village715_dev2.json',
+    'data/village715_dev3.json',
+    'data/village715_dev4.json'
+]
+
+SCENARIOS = [
+    1772,
+    23937,
+    10292
+]
+
+WEIGHTS = {
+    'length': 2,
+    'stops': 4
+}
+
+
+def make_environment(full=False, cache_dir=CACHE_DIR, catalog=None, bundle=None):
+
+    # load simulation environment, a bundle contains everything required without parsing any OSM data, rewards are
+    # computed once with the preset weights
+    if bundle is not None:
+        env = gym.make('Environment', bundle=bundle, weights=WEIGHTS)
+    elif catalog is not None:
+        route_files, deviation_files, scenarios = load_catalog(catalog)
+        env = gym.make('Environment', osm_file=OSM_FILE, route_files=route_files,
+                       deviation_files=deviation_files, scenarios=scenarios, cache_dir=cache_dir, weights=WEIGHTS)
+    elif full:
+        env = gym.make('Environment', osm_file=OSM_FILE, route_files=FULL_ROUTE_FILES,
+                       deviation_files=FULL_DEVIATION_FILES, scenarios=SCENARIOS, cache_dir=cache_dir, weights=WEIGHTS)
+    else:
+        env = gym.make('Environment', osm_file=OSM_FILE, route_files=ROUTE_FILES,
+                       deviation_files=DEVIATION_FILES, scenarios=SCENARIOS, cache_dir=cache_dir, weights=WEIGHTS)
+
+    return env
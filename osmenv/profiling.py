@@ -0,0 +1,137 @@
+import functools
+import json
+import sys
+import time
+
+
+class NullProfiler:
+
+    # profiler doing nothing, used unless profiling is enabled explicitly
+    enabled = False
+
+    def start(self):
+        return 0.0
+
+    def stop(self, name, start):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def instrument(self, obj, names, prefix=None):
+        pass
+
+    def instrument_environment(self, env):
+        pass
+
+    def report(self):
+        return {'timers': dict(), 'counters': dict()}
+
+
+class Profiler(NullProfiler):
+
+    enabled = True
+
+    def __init__(self):
+
+        # timers are kept as name -> [count, total, min, max] in seconds, counters as name -> count
+        self._timers = dict()
+        self._counters = dict()
+
+    def start(self):
+        return time.perf_counter()
+
+    def stop(self, name, start):
+
+        duration = time.perf_counter() - start
+
+        timer = self._timers.get(name)
+        if timer is None:
+            self._timers[name] = [1, duration, duration, duration]
+        else:
+            timer[0] += 1
+            timer[1] += duration
+            timer[2] = min(timer[2], duration)
+            timer[3] = max(timer[3], duration)
+
+    def count(self, name, n=1):
+        self._counters[name] = self._counters.get(name, 0) + n
+
+    def reset(self):
+        self._timers = dict()
+        self._counters = dict()
+
+    def instrument(self, obj, names, prefix=None):
+
+        # replace methods of a single object by timed ones, the class and other instances remain untouched
+        prefix = prefix if prefix is not None else type(obj).__name__
+
+        for name in names:
+            method = getattr(obj, name)
+            setattr(obj, name, self._timed(method, '{0}.{1}'.format(prefix, name)))
+
+    def instrument_environment(self, env):
+
+        # time the public and internal steps of the environment as well as the calls of its router
+        env = env.unwrapped
+        self.instrument(env, ['step', 'reset', '_get_reward', '_compute_rewards', '_compute_route_rewards'], 'env')
+
+        router = getattr(env, '_router', None)
+        if router is not None:
+            self.instrument(router, ['route_length', 'cumulative_length', 'route_contains_point', 'find_route',
+                                     'snap'], 'router')
+
+    def report(self):
+
+        timers = dict()
+        for name, (count, total, minimum, maximum) in self._timers.items():
+            timers[name] = {
+                'count': count,
+                'total': total,
+                'mean': total / count,
+                'min': minimum,
+                'max': maximum
+            }
+
+        return {'timers': timers, 'counters': dict(self._counters)}
+
+    def print_report(self, file=None):
+
+        file = file if file is not None else sys.stdout
+        report = self.report()
+
+        print('{0:<32} {1:>10} {2:>12} {3:>12} {4:>12}'.format('timer', 'count', 'total [s]', 'mean [us]',
+                                                              'max [us]'), file=file)
+
+        for name, timer in sorted(report['timers'].items(), key=lambda t: t[1]['total'], reverse=True):
+            print('{0:<32} {1:>10} {2:>12.4f} {3:>12.2f} {4:>12.2f}'.format(
+                name, timer['count'], timer['total'], timer['mean'] * 1e6, timer['max'] * 1e6), file=file)
+
+        if len(report['counters']) > 0:
+            print(file=file)
+            print('{0:<32} {1:>10}'.format('counter', 'count'), file=file)
+
+            for name, count in sorted(report['counters'].items()):
+                print('{0:<32} {1:>10}'.format(name, count), file=file)
+
+    def dump(self, filename):
+
+        with open(filename, 'w') as f:
+            json.dump(self.report(), f, indent=2)
+
+            f.close()
+
+    def _timed(self, method, name):
+
+        @functools.wraps(method)
+        def timed_method(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.stop(name, start)
+
+        return timed_method
+
+
+NULL_PROFILER = NullProfiler()
@@ -1,74 +1,198 @@
+import heapq
+import math
+import os
+
+import numpy as np
 import pyroutelib3
 
+from pyroutelib3.err import InvalidNode
+from osmenv.graph import RoutingGraph
+from osmenv.graph import graph_cache_key
+from osmenv.spatial import NodeIndex
+from osmenv.spatial import cumulative_length
+from osmenv.spatial import path_length
+
+
+def osm_file_type(filename):
+
+    # pyroutelib3 reads OSM XML, compressed OSM XML and PBF files
+    if filename.endswith('.pbf'):
+        return 'pbf'
+    elif filename.endswith('.gz'):
+        return 'gz'
+    elif filename.endswith('.bz2'):
+        return 'bz2'
+    else:
+        return 'xml'
+
+
+class _QueueItem:
+
+    __slots__ = ('node', 'route_to', 'cost_to', 'heuristic', 'force_next')
+
+    def __init__(self, node, route_to, cost_to, heuristic, force_next=None):
+        self.node = node
+        self.route_to = route_to
+        self.cost_to = cost_to
+        self.heuristic = heuristic
+        self.force_next = force_next or []
+
+    def __lt__(self, other):
+        return self.heuristic < other.heuristic
+
 
 class OfflineRouter:
 
-    def __init__(self, osm_filename, router_type):
+    def __init__(self, osm_filename, router_type, cache_dir=None, engine='pyroutelib3'):
+
+        # routes are either found by pyroutelib3 or by searching the compiled edge arrays
+        if engine not in ('pyroutelib3', 'csr'):
+            raise RuntimeError('invalid routing engine, expected pyroutelib3 or csr')
+
+        self._engine = engine
+
+        # spatial index and compiled routing graph of all nodes, built on first use
+        self._node_index = None
+        self._graph = None
+
+        # without cache directory the OSM file is parsed each time
+        if cache_dir is None:
+            self._router = pyroutelib3.Router(transport=router_type, localfile=osm_filename,
+                                              localfileType=osm_file_type(osm_filename))
+            return
+
+        # use cached routing graph if the OSM file and router type were already parsed once
+        cache_filename = os.path.join(cache_dir, graph_cache_key(osm_filename, router_type) + '.graph')
+
+        if os.path.exists(cache_filename):
+            self._graph = RoutingGraph.load(cache_filename)
+            self._router = self._graph.to_router(router_type)
+        else:
+            self._router = pyroutelib3.Router(transport=router_type, localfile=osm_filename,
+                                              localfileType=osm_file_type(osm_filename))
+            self._graph = RoutingGraph.from_router(self._router)
 
-        self._router = pyroutelib3.Router(transport=router_type, localfile=osm_filename, localfileType='pbf')
+            os.makedirs(cache_dir, exist_ok=True)
+            self._graph.save(cache_filename)
 
     def _length(self, node_sequence):
+        return path_length(self._coordinates(node_sequence))
 
-        length = 0.0
-        for i in range(1, len(node_sequence)):
-            pos1 = self._router.rnodes[node_sequence[i - 1]]
-            pos2 = self._router.rnodes[node_sequence[i]]
+    def _coordinates(self, node_sequence):
 
-            length += self._router.distance(pos1, pos2)
+        # look up coordinates of all nodes at once
+        graph = self._get_graph()
+        indices = graph.node_index(node_sequence) if len(node_sequence) > 0 else np.zeros(0, dtype=np.int64)
 
-        return length
+        if np.any(indices < 0):
+            raise KeyError(node_sequence[int(np.argmax(indices < 0))])
+
+        return graph.coordinates[indices]
+
+    def _get_graph(self):
+
+        if self._graph is None:
+            self._graph = RoutingGraph.from_router(self._router)
+
+        return self._graph
+
+    def _get_node_index(self):
+
+        if self._node_index is None:
+            self._node_index = NodeIndex(list(self._router.rnodes.keys()), list(self._router.rnodes.values()))
+
+        return self._node_index
 
     def _standard_location(self, location):
 
         if type(location) is tuple and len(location) == 2:
-            return self._router.findNode(location[0], location[1])
+            return int(self._get_node_index().nearest(location[0], location[1])[0])
         elif type(location) is int:
             return location
         else:
             raise RuntimeError('invalid location, expected type int or tuple(2)')
 
+    def _standard_locations(self, locations):
+
+        # arrays of node IDs are already standard locations
+        if isinstance(locations, np.ndarray) and np.issubdtype(locations.dtype, np.integer):
+            return locations
+
+        # snap all coordinates at once, node IDs are taken as they are
+        node_sequence = [l if type(l) is int else None for l in locations]
+        coordinates = [l for l in locations if type(l) is not int]
+
+        for l in coordinates:
+            if type(l) is not tuple or len(l) != 2:
+                raise RuntimeError('invalid location, expected type int or tuple(2)')
+
+        if len(coordinates) > 0:
+            nodes = iter(self.snap(coordinates).tolist())
+            node_sequence = [n if n is not None else next(nodes) for n in node_sequence]
+
+        return node_sequence
+
+    def nodes(self):
+
+        # IDs and lat, lon coordinates of all nodes of the routing network
+        graph = self._get_graph()
+
+        return graph.node_ids, graph.coordinates
+
+    def snap(self, coordinates, return_distances=False):
+
+        # find the closest node ID of each lat, lon coordinate in one call
+        nodes, distances = self._get_node_index().nearest_many(np.asarray(coordinates, dtype=np.float64))
+
+        if return_distances:
+            return nodes, distances
+        else:
+            return nodes
+
     def route_length(self, locations):
 
         # transform locations into node sequence
-        node_sequence = [self._standard_location(l) for l in locations]
+        node_sequence = self._standard_locations(locations)
 
         return self._length(node_sequence)
 
+    def cumulative_length(self, locations):
+
+        # distance of each location from the first one along the route, lengths of sections are differences
+        node_sequence = self._standard_locations(locations)
+
+        return cumulative_length(self._coordinates(node_sequence))
+
     def route_contains_point(self, locations, point):
 
         # transform point to closest node ID
-        node = self._standard_location(point)
+        nodes, distances = self.snap([point], return_distances=True)
+        node = int(nodes[0])
 
         # if the closest node is more than 130m away, ignore it - it can't be on route
         # this high distance is needed since there are some ways which have points with a distance greater than 200m
-        distance = self._router.distance(
-            (self._router.rnodes[node][0], self._router.rnodes[node][1]),
-            (point[0], point[1])
-        )
-
-        if distance > 0.130:
+        if distances[0] > 0.130:
             return False
 
         # transform location list into node sequence
-        node_sequence = [self._standard_location(l) for l in locations]
+        node_sequence = self._standard_locations(locations)
 
         return node in node_sequence
 
-    def find_route(self, start, destination, via_list=None, not_via_list=None):
+    def find_route(self, start, destination, via_list=None, not_via_list=None, not_via_edges=None):
 
         # standardize start and destination
         start = self._standard_location(start)
         destination = self._standard_location(destination)
 
-        # temporary save loaded routing network
-        # remove not-via items out of routing network
-        _routing_network = self._router.routing.copy()
+        # not-via items are excluded by the search itself, the loaded routing network remains untouched
+        blocked_nodes = set()
         if not_via_list is not None:
-            for not_via in not_via_list:
+            blocked_nodes = set(self._standard_locations(not_via_list))
 
-                not_via = self._standard_location(not_via)
-                if not_via in self._router.routing.keys():
-                    self._router.routing.pop(not_via, None)
+        blocked_edges = set()
+        if not_via_edges is not None:
+            blocked_edges = {(self._standard_location(a), self._standard_location(b)) for a, b in not_via_edges}
 
         # define result containers
         node_sequence = list()
@@ -81,7 +205,7 @@ class OfflineRouter:
 
                 via = self._standard_location(via)
 
-                code, nodes = self._router.doRoute(last_node, via)
+                code, nodes = self._do_route(last_node, via, blocked_nodes, blocked_edges)
                 if code == 'success':
                     node_sequence += nodes
                 elif code != 'success' and status == 'success':
@@ -90,17 +214,90 @@ class OfflineRouter:
                 last_node = via
 
         # find route to last step
-        code, nodes = self._router.doRoute(last_node, destination)
+        code, nodes = self._do_route(last_node, destination, blocked_nodes, blocked_edges)
         if code == 'success':
             node_sequence += nodes
         elif code != 'success' and status == 'success':
             status = code
 
-        # reset routing network back to what was loaded originally
-        self._router.routing = _routing_network
-
         # generate return values
         lat_lon_list = list(map(self._router.nodeLatLon, node_sequence))
         length = self._length(node_sequence)
 
         return status, node_sequence, lat_lon_list, length
+
+    def _do_route(self, start, end, blocked_nodes, blocked_edges):
+
+        if self._engine == 'csr':
+            return self._get_graph().route(start, end, blocked_nodes, blocked_edges)
+
+        # A* search of pyroutelib3.Router.doRoute, blocked nodes are never left and blocked edges never used
+        router = self._router
+
+        if start not in router.rnodes:
+            raise InvalidNode('Start node ({0}) doesn\'t exist in graph'.format(start))
+
+        if end not in router.rnodes:
+            raise InvalidNode('End node ({0}) doesn\'t exist in graph'.format(end))
+
+        if start == end:
+            return 'success', [start]
+
+        searched = 0
+        queue = list()
+        known_scores = {start: 0}
+        end_location = router.rnodes[end]
+
+        heapq.heappush(queue, _QueueItem(start, [start], 0, router.distance(router.rnodes[start], end_location)))
+
+        while queue:
+
+            searched += 1
+            if searched > pyroutelib3.SEARCH_LIMIT:
+                return 'gave_up', []
+
+            current = heapq.heappop(queue)
+            current_length = len(current.route_to)
+
+            if current.node == end:
+                return 'success', current.route_to
+
+            # a blocked node may be reached, but the route can't continue from there
+            if current.node in blocked_nodes:
+                continue
+
+            for to_node, edge_cost in router.routing.get(current.node, {}).items():
+
+                # ignore non-traversible and blocked edges
+                if edge_cost <= 0 or (current.node, to_node) in blocked_edges:
+                    continue
+
+                # no turn-around at nodes (no a-b-a)
+                if current_length >= 2 and current.route_to[-2] == to_node:
+                    continue
+
+                # check if a mandatory move is performed and is followed
+                if current.force_next and current.force_next[0] != to_node:
+                    continue
+
+                item = _QueueItem(
+                    to_node,
+                    current.route_to + [to_node],
+                    current.cost_to + edge_cost,
+                    current.cost_to + router.distance(router.rnodes[to_node], end_location),
+                    current.force_next[1:]
+                )
+
+                # check if a cheaper route to the node exists or the route runs into a restriction
+                if item.cost_to > known_scores.get(to_node, math.inf):
+                    continue
+
+                if router._routeIsForbidden(item.route_to):
+                    continue
+
+                item.force_next = router._routeForceNext(item.route_to, item.force_next)
+
+                known_scores[to_node] = item.cost_to
+                heapq.heappush(queue, item)
+
+        return 'no_route', []
@@ -1,5 +1,3 @@
-import time
-
 import numpy as np
 import pandas as pd
 
@@ -8,88 +6,60 @@ from osmenv.algorithm import TemporalDifferenceAlgorithm
 
 class Sarsa(TemporalDifferenceAlgorithm):
 
-    def __init__(self, environment, episodes=0):
-        super(Sarsa, self).__init__(environment, episodes)
+    _datatype = 'SARSA'
+
+    def __init__(self, environment, episodes=0, dense=False):
+        super(Sarsa, self).__init__(environment, episodes, dense)
 
         # define fixed epsilon
         self._epsilon_min = 0.025
 
-    def fit(self, gamma, epsilon, epsilon_decay=0.999, alpha=0.8, filename=None):
-
-        # init process monitoring variables
-        terminate = False  # terminate flag
-
-        episode_steps = list()
-        episode_rewards = list()
-        episode_deltas = list()
-        episode_durations = list()
-        episode_epsilons = list()
-        episode_count = 0
-
-        # sarsa implementation
-        while terminate is False:
-
-            # resent environment and decay epsilon
-            state, _ = self._env.reset()
-            action = self._strategy(state, epsilon)
-
-            epsilon = max(epsilon * epsilon_decay, self._epsilon_min)
+    def _run_episode(self, gamma, epsilon, epsilon_decay, alpha):
 
-            # init episode monitoring variables
-            episode_step = 0
-            episode_reward = 0
-            episode_delta = 0
+        # resent environment and decay epsilon
+        state, _ = self._env.reset()
+        action = self._strategy(state, epsilon)
 
-            episode_start = time.time()
+        epsilon = max(epsilon * epsilon_decay, self._epsilon_min)
 
-            # run each episode
-            done = False
-            while not done:
+        # init episode monitoring variables
+        episode_step = 0
+        episode_reward = 0
+        episode_delta = 0
 
-                # apply action in environment
-                next_state, reward, done, info = self._env.step(action)
-                next_action = self._strategy(next_state, epsilon)
+        profiler = self._profiler
 
-                # store q value and next q value for convergence check
-                q_value = self._q_table[state][action]
-                next_q_value = q_value + reward + alpha * \
-                               (gamma * self._q_table[next_state][next_action] - self._q_table[state][action])
+        # run each episode
+        done = False
+        while not done:
 
-                self._q_table[state][action] = next_q_value
-                state = next_state
+            # apply action in environment
+            start = profiler.start()
+            next_state, reward, done, info = self._env.step(action)
+            profiler.stop('step', start)
 
-                episode_step += 1
-                episode_reward += (gamma ** episode_step) * reward
-                episode_delta = max(episode_delta, q_value - next_q_value)
+            start = profiler.start()
+            next_action = self._strategy(next_state, epsilon)
+            profiler.stop('action', start)
 
-            episode_end = time.time()
+            # store q value and next q value for convergence check
+            start = profiler.start()
+            q_actions = self._q_table[state]
 
-            episode_count += 1
+            q_value = q_actions[action]
+            next_q_value = q_value + reward + alpha * \
+                           (gamma * self._q_table[next_state][next_action] - q_value)
 
-            episode_steps.append(episode_step)
-            episode_rewards.append(episode_reward)
-            episode_deltas.append(np.absolute(episode_delta))
-            episode_durations.append(episode_end - episode_start)
-            episode_epsilons.append(epsilon)
+            q_actions[action] = next_q_value
+            state = next_state
 
-            if len(episode_deltas) > 200:
-                if self._num_episodes > 0:
-                    terminate = True if episode_count >= self._num_episodes else False
-                else:
-                    max_delta = np.max(episode_deltas[-200:])
-                    terminate = True if max_delta < 0.0001 else False
+            profiler.stop('update', start)
 
-        # create monitoring file name if required
-        if filename is not None:
-            self._create_monitoring_file(filename, 'SARSA',
-                                         episode_count,
-                                         episode_steps,
-                                         episode_rewards,
-                                         episode_deltas,
-                                         episode_durations,
-                                         episode_epsilons)
+            episode_step += 1
+            episode_reward += (gamma ** episode_step) * reward
+            episode_delta = max(episode_delta, q_value - next_q_value)
 
-        return episode_count
+        return episode_step, episode_reward, episode_delta, epsilon
 
     def _strategy(self, state, epsilon):
 
@@ -97,16 +67,18 @@ class Sarsa(TemporalDifferenceAlgorithm):
 
         n = 3
         q_actions = self._q_table[state]
+        valid_actions = self._valid_actions[state[0]].tolist()
 
         if np.random.random() < epsilon or np.sum(q_actions) == 0:
 
             # consider only top N actions and those which are never visited yet ( => == 0)
-            top_actions = sorted(range(len(q_actions)), key=lambda sub: q_actions[sub])[-n:]
-            zero_actions = [i for i, a in enumerate(q_actions) if a == 0.0]
+            # both of them among the actions applicable to the route only
+            top_actions = sorted(valid_actions, key=lambda sub: q_actions[sub])[-n:]
+            zero_actions = [i for i in valid_actions if q_actions[i] == 0.0]
             action_space = top_actions + zero_actions
 
             action = action_space[np.random.randint(0, len(action_space))]
         else:
-            action = np.argmax(q_actions)
+            action = self._greedy_action(state, q_actions)
 
         return action
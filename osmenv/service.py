@@ -0,0 +1,310 @@
+import asyncio
+import json
+import os
+import time
+
+import numpy as np
+
+from osmenv.storage import best_actions
+from osmenv.storage import is_binary_q_table
+from osmenv.storage import read_action_mask
+from osmenv.storage import read_q_table
+
+
+class RecommendationTable:
+
+    def __init__(self, actions, routes, deviations, scenarios, filename=None):
+
+        # best action of each route and scenario in the initial state, i.e. before any deviation was chosen
+        self.actions = actions.tolist()
+
+        self.routes = routes
+        self.deviations = deviations
+        self.scenarios = scenarios
+        self.filename = filename
+        self.loaded_at = time.time()
+
+        # routes are looked up by their ID, scenarios by their blocked node
+        self._route_index = {r: i for i, r in enumerate(routes)}
+        self._scenario_index = {s: i for i, s in enumerate(scenarios)}
+
+    @classmethod
+    def load(cls, filename):
+
+        # only binary q-tables carry the IDs of routes, deviations and scenarios as well as the applicable actions,
+        # JSON q-tables would recommend deviations that aren't applicable to a route
+        if not is_binary_q_table(filename):
+            raise RuntimeError('invalid file {0}, expected binary q-table'.format(filename))
+
+        q_table, header = read_q_table(filename)
+        action_mask = read_action_mask(filename)
+
+        return cls(best_actions(q_table[:, 0], action_mask), header['routes'], header['deviations'], header['scenarios'],
+                   filename)
+
+    def recommend(self, route, node):
+
+        route_index = self._route_index.get(route)
+        if route_index is None:
+            raise KeyError('unknown route {0}'.format(route))
+
+        scenario_index = self._scenario_index.get(node)
+        if scenario_index is None:
+            raise KeyError('unknown blocked node {0}'.format(node))
+
+        # action 0 means no deviation, all others are deviations
+        action = self.actions[route_index][scenario_index]
+
+        return {
+            'route': route,
+            'node': node,
+            'action': action,
+            'deviation': self.deviations[action - 1] if action > 0 else None
+        }
+
+
+class RecommendationService:
+
+    def __init__(self, filename, watch_interval=1.0, on_reload_error=None):
+
+        # the table is replaced as a whole when reloaded, each request works on the table it started with
+        self._filename = filename
+        self._table = RecommendationTable.load(filename)
+        self._modified = os.stat(filename).st_mtime_ns
+
+        # the q-table file is checked for changes regularly, no checks without interval
+        self._watch_interval = watch_interval
+        self._watch_task = None
+
+        self._reloads = 0
+        self._requests = 0
+
+        # failed reloads of a watched file are counted and passed to the callback, if any
+        self._on_reload_error = on_reload_error
+        self._reload_errors = 0
+        self._last_reload_error = None
+
+    @property
+    def table(self):
+        return self._table
+
+    async def start(self, host='127.0.0.1', port=8765):
+
+        server = await asyncio.start_server(self._handle_connection, host, port)
+
+        if self._watch_interval is not None and self._watch_interval > 0 and self._watch_task is None:
+            self._watch_task = asyncio.ensure_future(self._watch())
+
+        return server
+
+    async def close(self):
+
+        # stop watching the q-table file, the server itself is closed by its owner
+        if self._watch_task is None:
+            return
+
+        watch_task = self._watch_task
+        self._watch_task = None
+
+        watch_task.cancel()
+
+        try:
+            await watch_task
+        except asyncio.CancelledError:
+            pass
+
+    async def serve_forever(self, host='127.0.0.1', port=8765):
+
+        server = await self.start(host, port)
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            await self.close()
+
+    async def reload(self, filename=None):
+
+        filename = filename if filename is not None else self._filename
+
+        # the new table is built aside and swapped at once, requests are answered by the old table meanwhile
+        loop = asyncio.get_running_loop()
+        table = await loop.run_in_executor(None, RecommendationTable.load, filename)
+
+        self._table = table
+        self._filename = filename
+        self._modified = os.stat(filename).st_mtime_ns
+        self._reloads += 1
+
+        return table
+
+    async def _watch(self):
+
+        while True:
+            await asyncio.sleep(self._watch_interval)
+
+            try:
+                modified = os.stat(self._filename).st_mtime_ns
+                if modified == self._modified:
+                    continue
+
+                self._modified = modified
+                await self.reload()
+            except Exception as e:
+
+                # a broken file is reported, the current table remains active
+                self._reload_errors += 1
+                self._last_reload_error = str(e)
+
+                if self._on_reload_error is not None:
+                    self._on_reload_error(self._filename, e)
+
+    async def _handle_connection(self, reader, writer):
+
+        # requests and responses are JSON objects, one per line
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                response = await self._respond(line)
+
+                writer.write(json.dumps(response).encode('utf-8') + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _respond(self, line):
+
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'error': 'invalid request, expected JSON object'}
+
+        if type(request) is not dict:
+            return {'error': 'invalid request, expected JSON object'}
+
+        self._requests += 1
+
+        if 'command' in request:
+            return await self._command(request)
+
+        table = self._table
+
+        # several queries are answered at once, each of them has its own result
+        if 'queries' in request:
+            if type(request['queries']) is not list:
+                return {'error': 'invalid request, expected list of queries'}
+
+            return {'results': [self._recommend(table, q) for q in request['queries']]}
+
+        return self._recommend(table, request)
+
+    async def _command(self, request):
+
+        command = request['command']
+
+        if command == 'info':
+            return {
+                'filename': self._table.filename,
+                'loaded_at': self._table.loaded_at,
+                'reloads': self._reloads,
+                'reload_errors': self._reload_errors,
+                'last_reload_error': self._last_reload_error,
+                'requests': self._requests,
+                'routes': self._table.routes,
+                'deviations': self._table.deviations,
+                'scenarios': self._table.scenarios
+            }
+        elif command == 'reload':
+            try:
+                await self.reload(request.get('filename'))
+            except Exception as e:
+                return {'error': 'failed to reload: {0}'.format(e)}
+
+            return {'filename': self._table.filename, 'loaded_at': self._table.loaded_at, 'reloads': self._reloads}
+        else:
+            return {'error': 'unknown command {0}'.format(command)}
+
+    @staticmethod
+    def _recommend(table, query):
+
+        if type(query) is not dict:
+            return {'error': 'invalid query, expected JSON object'}
+
+        try:
+            return table.recommend(query.get('route'), query.get('node'))
+        except KeyError as e:
+            return {'error': e.args[0]}
+        except (TypeError, ValueError):
+
+            # routes and nodes of any other type, e.g. lists or objects, can't be looked up
+            return {'error': 'invalid query, expected route and node'}
+
+
+async def run_load_test(host, port, num_requests=10000, concurrency=8, batch_size=1, seed=0):
+
+    # queries are drawn from the routes and scenarios known by the service
+    reader, writer = await asyncio.open_connection(host, port)
+
+    writer.write(b'{"command": "info"}\n')
+    await writer.drain()
+
+    info = json.loads(await reader.readline())
+    writer.close()
+
+    rng = np.random.default_rng(seed)
+    routes = info['routes']
+    scenarios = info['scenarios']
+
+    requests = list()
+    for _ in range(num_requests):
+        queries = [{'route': routes[int(rng.integers(len(routes)))],
+                    'node': scenarios[int(rng.integers(len(scenarios)))]} for _ in range(batch_size)]
+
+        request = queries[0] if batch_size == 1 else {'queries': queries}
+        requests.append(json.dumps(request).encode('utf-8') + b'\n')
+
+    # each client sends its next request as soon as the previous one was answered
+    latencies = np.zeros(num_requests)
+    errors = 0
+
+    async def client(indices):
+
+        nonlocal errors
+
+        client_reader, client_writer = await asyncio.open_connection(host, port)
+
+        for i in indices:
+            start = time.perf_counter()
+
+            client_writer.write(requests[i])
+            await client_writer.drain()
+            response = await client_reader.readline()
+
+            latencies[i] = time.perf_counter() - start
+
+            if b'"error"' in response:
+                errors += 1
+
+        client_writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[client(range(c, num_requests, concurrency)) for c in range(concurrency)])
+    duration = time.perf_counter() - start
+
+    return {
+        'requests': num_requests,
+        'queries': num_requests * batch_size,
+        'concurrency': concurrency,
+        'batch_size': batch_size,
+        'errors': errors,
+        'duration': duration,
+        'throughput': num_requests * batch_size / duration,
+        'p50': float(np.percentile(latencies, 50)),
+        'p99': float(np.percentile(latencies, 99)),
+        'max': float(np.max(latencies))
+    }
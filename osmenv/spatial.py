@@ -0,0 +1,184 @@
+import math
+
+import numpy as np
+
+EARTH_RADIUS = 6371.0
+DEGREE_LENGTH = EARTH_RADIUS * math.pi / 180.0
+
+
+def haversine(lat1, lon1, lat2, lon2):
+
+    # same formula as pyroutelib3.distHaversine, but for arrays of coordinates, distance in km
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    dlathalf = (lat2 - lat1) * 0.5
+    dlonhalf = (lon2 - lon1) * 0.5
+
+    sqrth = np.sqrt(np.sin(dlathalf) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlonhalf) ** 2)
+
+    return np.arcsin(np.minimum(sqrth, 1.0)) * 2 * EARTH_RADIUS
+
+
+def cumulative_length(coordinates):
+
+    # distance from the first coordinate to each coordinate of the sequence along the sequence, in km
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+
+    distances = np.zeros(len(coordinates), dtype=np.float64)
+    if len(coordinates) > 1:
+        np.cumsum(haversine(coordinates[:-1, 0], coordinates[:-1, 1], coordinates[1:, 0], coordinates[1:, 1]),
+                  out=distances[1:])
+
+    return distances
+
+
+def path_length(coordinates):
+
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if len(coordinates) < 2:
+        return 0.0
+
+    return float(np.sum(haversine(coordinates[:-1, 0], coordinates[:-1, 1], coordinates[1:, 0], coordinates[1:, 1])))
+
+
+class NodeIndex:
+
+    def __init__(self, node_ids, coordinates, cell_size=None):
+
+        self._node_ids = np.asarray(node_ids)
+        self._coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+
+        if len(self._node_ids) == 0:
+            raise KeyError('node index of an empty space')
+
+        # project coordinates equirectangular, thus grid cells are roughly square
+        self._lon_scale = math.cos(math.radians(float(np.mean(self._coordinates[:, 0]))))
+
+        x = self._coordinates[:, 1] * self._lon_scale
+        y = self._coordinates[:, 0]
+
+        self._origin = float(np.min(x)), float(np.min(y))
+        extent = float(np.max(x)) - self._origin[0], float(np.max(y)) - self._origin[1]
+
+        # choose cell size in degrees latitude for about one node per cell if not specified
+        if cell_size is None:
+            cell_size = math.sqrt(max(extent[0] * extent[1], 1e-12) / len(self._node_ids))
+
+        self._cell_size = max(cell_size, 1e-6)
+
+        # sort nodes by cell, nodes of cell c are cell_nodes[cell_offsets[c]:cell_offsets[c + 1]]
+        cx, cy = self._cell_position(self._coordinates[:, 0], self._coordinates[:, 1])
+        self._shape = int(np.max(cx)) + 1, int(np.max(cy)) + 1
+
+        cells = self._cell_id(cx, cy)
+
+        self._cell_nodes = np.argsort(cells, kind='stable')
+        self._cell_offsets = np.concatenate([
+            [0], np.cumsum(np.bincount(cells, minlength=self._shape[0] * self._shape[1]))
+        ])
+
+    def nearest(self, lat, lon):
+
+        nodes, distances = self.nearest_many([(lat, lon)])
+
+        return nodes[0], distances[0]
+
+    def nearest_many(self, coordinates):
+
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        lat, lon = coordinates[:, 0], coordinates[:, 1]
+
+        best_index = np.full(len(coordinates), -1, dtype=np.int64)
+        best_distance = np.full(len(coordinates), np.inf)
+
+        cx, cy = self._cell_position(lat, lon)
+
+        # coordinates outside of the grid are compared against all nodes, this is rarely the case
+        outside = (cx < 0) | (cx >= self._shape[0]) | (cy < 0) | (cy >= self._shape[1])
+
+        for i in np.flatnonzero(outside):
+            distances = haversine(lat[i], lon[i], self._coordinates[:, 0], self._coordinates[:, 1])
+
+            best_index[i] = np.argmin(distances)
+            best_distance[i] = distances[best_index[i]]
+
+        # search rings of cells around each query cell until no closer node can exist outside of the searched cells
+        pending = np.flatnonzero(~outside)
+        ring = 0
+
+        while len(pending) > 0:
+
+            dx, dy = self._ring_offsets(ring)
+
+            ring_cx = (cx[pending][:, None] + dx[None, :]).reshape(-1)
+            ring_cy = (cy[pending][:, None] + dy[None, :]).reshape(-1)
+            ring_queries = np.repeat(pending, len(dx))
+
+            valid = (ring_cx >= 0) & (ring_cx < self._shape[0]) & (ring_cy >= 0) & (ring_cy < self._shape[1])
+            self._update_nearest(lat, lon, ring_queries[valid], self._cell_id(ring_cx[valid], ring_cy[valid]),
+                                 best_index, best_distance)
+
+            # all cells of the grid are searched at the latest now
+            if ring >= max(self._shape):
+                break
+
+            # slightly shrink the searched radius to stay on the safe side of the projection
+            searched_distance = ring * self._cell_size * DEGREE_LENGTH * 0.9
+            pending = pending[best_distance[pending] > searched_distance]
+
+            ring += 1
+
+        return self._node_ids[best_index], best_distance
+
+    def _update_nearest(self, lat, lon, queries, cells, best_index, best_distance):
+
+        starts = self._cell_offsets[cells]
+        counts = self._cell_offsets[cells + 1] - starts
+
+        total = int(np.sum(counts))
+        if total == 0:
+            return
+
+        # expand each query into one candidate per node of its cells
+        candidate_queries = np.repeat(queries, counts)
+        candidate_positions = np.repeat(starts - np.cumsum(counts) + counts, counts) + np.arange(total)
+        candidates = self._cell_nodes[candidate_positions]
+
+        distances = haversine(lat[candidate_queries], lon[candidate_queries],
+                              self._coordinates[candidates, 0], self._coordinates[candidates, 1])
+
+        # keep closest candidate of each query, ties are resolved by the order of the nodes
+        order = np.lexsort((candidates, distances, candidate_queries))
+        first = np.ones(total, dtype=bool)
+        first[1:] = candidate_queries[order][1:] != candidate_queries[order][:-1]
+
+        closest = order[first]
+        queries = candidate_queries[closest]
+
+        closer = distances[closest] < best_distance[queries]
+        best_index[queries[closer]] = candidates[closest][closer]
+        best_distance[queries[closer]] = distances[closest][closer]
+
+    def _cell_position(self, lat, lon):
+
+        cx = np.floor((np.asarray(lon) * self._lon_scale - self._origin[0]) / self._cell_size).astype(np.int64)
+        cy = np.floor((np.asarray(lat) - self._origin[1]) / self._cell_size).astype(np.int64)
+
+        return cx, cy
+
+    def _cell_id(self, cx, cy):
+        return cx * self._shape[1] + cy
+
+    @staticmethod
+    def _ring_offsets(ring):
+
+        if ring == 0:
+            return np.zeros(1, dtype=np.int64), np.zeros(1, dtype=np.int64)
+
+        # all cells with a chebyshev distance of exactly ring
+        steps = np.arange(-ring, ring + 1, dtype=np.int64)
+        inner = steps[1:-1]
+
+        dx = np.concatenate([steps, steps, np.full(len(inner), -ring), np.full(len(inner), ring)])
+        dy = np.concatenate([np.full(len(steps), -ring), np.full(len(steps), ring), inner, inner])
+
+        return dx, dy
@@ -0,0 +1,169 @@
+import json
+import os
+import pickle
+import struct
+
+import numpy as np
+
+MAGIC = b'OSMENV01'
+ALIGNMENT = 64
+
+Q_TABLE_EXTENSION = '.qtable'
+CHECKPOINT_EXTENSION = '.checkpoint'
+
+
+def write_arrays(filename, arrays, header=None):
+
+    arrays = {name: np.ascontiguousarray(array) for name, array in arrays.items()}
+
+    # describe each array by its dtype, shape and offset relative to the aligned data section
+    descriptors = dict()
+    offset = 0
+
+    for name, array in arrays.items():
+        descriptors[name] = {
+            'dtype': array.dtype.str,
+            'shape': list(array.shape),
+            'offset': offset
+        }
+
+        offset = _align(offset + array.nbytes)
+
+    header_data = json.dumps({
+        'header': header if header is not None else dict(),
+        'arrays': descriptors
+    }).encode('utf-8')
+
+    data_start = _align(len(MAGIC) + 8 + len(header_data))
+
+    # write into a temporary file first, thus readers never see a partially written file
+    temporary_filename = filename + '.tmp'
+
+    with open(temporary_filename, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header_data)))
+        f.write(header_data)
+
+        for name, array in arrays.items():
+            f.write(b'\0' * (data_start + descriptors[name]['offset'] - f.tell()))
+            f.write(array.tobytes())
+
+        f.close()
+
+    os.replace(temporary_filename, filename)
+
+
+def read_arrays(filename, mode='r'):
+
+    with open(filename, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise RuntimeError('invalid file {0}, expected binary array file'.format(filename))
+
+        header_length, = struct.unpack('<Q', f.read(8))
+        header_data = json.loads(f.read(header_length).decode('utf-8'))
+
+        f.close()
+
+    data_start = _align(len(MAGIC) + 8 + header_length)
+
+    # map each array into memory, nothing is read until the data are accessed
+    arrays = dict()
+    for name, descriptor in header_data['arrays'].items():
+        dtype = np.dtype(descriptor['dtype'])
+        shape = tuple(descriptor['shape'])
+
+        if int(np.prod(shape)) == 0:
+            arrays[name] = np.zeros(shape, dtype=dtype)
+        else:
+            arrays[name] = np.memmap(filename, dtype=dtype, mode=mode, offset=data_start + descriptor['offset'],
+                                     shape=shape)
+
+    return header_data['header'], arrays
+
+
+def write_q_table(filename, q_table, routes, deviations, scenarios, action_mask=None):
+
+    # the actions applicable to each route are stored along with the q-table, if known
+    arrays = {'q_table': q_table}
+    if action_mask is not None:
+        arrays['action_mask'] = np.asarray(action_mask, dtype=bool)
+
+    write_arrays(filename, arrays, {
+        'type': 'q-table',
+        'routes': [str(r) for r in routes],
+        'deviations': [str(d) for d in deviations],
+        'scenarios': [int(s) for s in scenarios]
+    })
+
+
+def read_q_table(filename, mode='r'):
+
+    header, arrays = read_arrays(filename, mode)
+
+    if header.get('type') != 'q-table':
+        raise RuntimeError('invalid file {0}, expected binary q-table'.format(filename))
+
+    return arrays['q_table'], header
+
+
+def read_action_mask(filename):
+
+    header, arrays = read_arrays(filename)
+
+    if header.get('type') != 'q-table':
+        raise RuntimeError('invalid file {0}, expected binary q-table'.format(filename))
+
+    # q-tables written without action mask allow all actions
+    return arrays.get('action_mask')
+
+
+def write_checkpoint(filename, checkpoint):
+
+    # write into a temporary file first and make sure it's on disk, thus an interrupted run never leaves a partially
+    # written checkpoint behind
+    temporary_filename = filename + '.tmp'
+
+    with open(temporary_filename, 'wb') as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        f.flush()
+        os.fsync(f.fileno())
+
+        f.close()
+
+    os.replace(temporary_filename, filename)
+
+
+def read_checkpoint(filename):
+
+    with open(filename, 'rb') as f:
+        checkpoint = pickle.load(f)
+
+        f.close()
+
+    if type(checkpoint) is not dict or checkpoint.get('type') != 'checkpoint':
+        raise RuntimeError('invalid file {0}, expected checkpoint'.format(filename))
+
+    return checkpoint
+
+
+def best_actions(q_actions, action_mask=None):
+
+    # best applicable action of q values shaped route, ..., action, inapplicable actions are never the best ones
+    q_actions = np.asarray(q_actions)
+
+    if action_mask is not None:
+        action_mask = np.asarray(action_mask, dtype=bool)
+        action_mask = action_mask.reshape(action_mask.shape[:1] + (1,) * (q_actions.ndim - 2) + action_mask.shape[1:])
+
+        q_actions = np.where(action_mask, q_actions, -np.inf)
+
+    return np.argmax(q_actions, axis=-1)
+
+
+def is_binary_q_table(filename):
+    return filename.endswith(Q_TABLE_EXTENSION)
+
+
+def _align(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
@@ -0,0 +1,151 @@
+import math
+
+import numpy as np
+
+from osmenv.spatial import DEGREE_LENGTH
+from osmenv.spatial import path_length
+
+# default origin of synthetic networks, somewhere around the bundled network
+ORIGIN = (48.85, 8.65)
+
+
+class GridNetwork:
+
+    def __init__(self, rows, columns, spacing=0.1, origin=ORIGIN):
+
+        if rows < 2 or columns < 2:
+            raise RuntimeError('invalid grid size, expected at least 2 rows and 2 columns')
+
+        # nodes are placed on a regular grid with spacing in km, node IDs start at 1
+        self.rows = rows
+        self.columns = columns
+        self.spacing = spacing
+        self.origin = origin
+
+        self._lat_step = spacing / DEGREE_LENGTH
+        self._lon_step = spacing / (DEGREE_LENGTH * math.cos(math.radians(origin[0])))
+
+    @property
+    def num_nodes(self):
+        return self.rows * self.columns
+
+    @property
+    def num_edges(self):
+
+        # each way segment can be passed in both directions
+        return 2 * (self.rows * (self.columns - 1) + self.columns * (self.rows - 1))
+
+    def node(self, row, column):
+        return row * self.columns + column + 1
+
+    def coordinate(self, row, column):
+
+        # coordinates are rounded like they are written into the OSM file
+        return round(self.origin[0] + row * self._lat_step, 7), round(self.origin[1] + column * self._lon_step, 7)
+
+    def node_coordinates(self, nodes):
+
+        rows, columns = np.divmod(np.asarray(nodes, dtype=np.int64) - 1, self.columns)
+
+        return np.round(np.stack([
+            self.origin[0] + rows * self._lat_step,
+            self.origin[1] + columns * self._lon_step
+        ], axis=1), 7)
+
+    def write_osm(self, filename):
+
+        # write OSM XML, every fourth row and column is a secondary road, all others are residential roads
+        with open(filename, 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+            f.write('<osm version="0.6" generator="osmenv">\n')
+
+            for row in range(self.rows):
+                for column in range(self.columns):
+                    lat, lon = self.coordinate(row, column)
+                    f.write('  <node id="{0}" lat="{1:.7f}" lon="{2:.7f}" version="1"/>\n'.format(
+                        self.node(row, column), lat, lon))
+
+            way_id = 1
+            for row in range(self.rows):
+                self._write_way(f, way_id, [self.node(row, c) for c in range(self.columns)], row % 4 == 0)
+                way_id += 1
+
+            for column in range(self.columns):
+                self._write_way(f, way_id, [self.node(r, column) for r in range(self.rows)], column % 4 == 0)
+                way_id += 1
+
+            f.write('</osm>\n')
+
+            f.close()
+
+    @staticmethod
+    def _write_way(f, way_id, nodes, secondary):
+
+        f.write('  <way id="{0}" version="1">\n'.format(way_id))
+
+        for node in nodes:
+            f.write('    <nd ref="{0}"/>\n'.format(node))
+
+        f.write('    <tag k="highway" v="{0}"/>\n'.format('secondary' if secondary else 'residential'))
+        f.write('  </way>\n')
+
+
+def make_catalog(network, num_routes, num_deviations, num_scenarios, seed=0):
+
+    # routes run along rows of the grid, deviations leave a route to a neighbouring row and return to it later
+    if network.columns < 5:
+        raise RuntimeError('invalid grid size, expected at least 5 columns for routes and deviations')
+
+    rng = np.random.default_rng(seed)
+    min_length = 4
+
+    routes = list()
+    for i in range(num_routes):
+        row = int(rng.integers(0, network.rows))
+        first = int(rng.integers(0, network.columns - min_length))
+        last = int(rng.integers(first + min_length, network.columns))
+
+        nodes = [network.node(row, c) for c in range(first, last + 1)]
+
+        routes.append({
+            'id': 'route{0}'.format(i + 1),
+            'length': path_length(network.node_coordinates(nodes)),
+            'stops': [{'name': 'Stop {0}'.format(n), 'node': n} for n in nodes[::3]],
+            'nodes': nodes,
+            '_row': row,
+            '_columns': (first, last)
+        })
+
+    deviations = list()
+    for i in range(num_deviations):
+        route = routes[int(rng.integers(0, len(routes)))]
+        row = route['_row']
+        first, last = route['_columns']
+
+        side_row = row + 1 if row + 1 < network.rows else row - 1
+        start = int(rng.integers(first, last - 1))
+        end = int(rng.integers(start + 2, last + 1))
+
+        nodes = [network.node(row, start)] + \
+                [network.node(side_row, c) for c in range(start, end + 1)] + \
+                [network.node(row, end)]
+
+        deviations.append({
+            'id': 'deviation{0}'.format(i + 1),
+            'length': path_length(network.node_coordinates(nodes)),
+            'nodes': nodes
+        })
+
+    # scenarios are blocked nodes of routes
+    route_nodes = sorted({n for r in routes for n in r['nodes']})
+    scenarios = rng.choice(route_nodes, size=min(num_scenarios, len(route_nodes)), replace=False).tolist()
+
+    for route in routes:
+        del route['_row']
+        del route['_columns']
+
+    return {
+        'routes': routes,
+        'deviations': deviations,
+        'scenarios': scenarios
+    }
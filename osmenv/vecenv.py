@@ -0,0 +1,76 @@
+import numpy as np
+
+from gym.utils import seeding
+
+
+class VectorEnvironment:
+
+    def __init__(self, environment, num_envs, max_episode_steps=None):
+
+        # all outcomes are precomputed by the wrapped environment, thus only the states are held here
+        self._env = environment.unwrapped
+        self.num_envs = num_envs
+
+        # take over the episode step limit of the registered environment if not specified explicitly
+        if max_episode_steps is None and environment.spec is not None:
+            max_episode_steps = environment.spec.max_episode_steps
+
+        self._max_episode_steps = max_episode_steps
+
+        # action and observation space of a single environment
+        self.action_space = self._env.action_space
+        self.observation_space = self._env.observation_space
+
+        # member variables representing the current states
+        self._status_route = np.zeros(num_envs, dtype=np.int64)
+        self._status_deviation = np.zeros(num_envs, dtype=np.int64)
+        self._status_scenario = np.zeros(num_envs, dtype=np.int64)
+        self._status_steps = np.zeros(num_envs, dtype=np.int64)
+
+        self.np_random, _ = seeding.np_random()
+
+    @property
+    def unwrapped(self):
+        return self._env
+
+    def seed(self, seed=None):
+        self.np_random, seed = seeding.np_random(seed)
+
+        return [seed]
+
+    def step(self, actions):
+
+        actions = np.asarray(actions, dtype=np.int64)
+
+        # the actions are copied, resetting environments must not change the caller's array
+        self._status_deviation[:] = actions
+        self._status_steps += 1
+
+        # get observations, rewards and done flags of all environments at once
+        observations = self._get_observations()
+        rewards = self._env.reward_table[self._status_route, actions, self._status_scenario]
+        dones = self._env.terminated_table[self._status_route, actions, self._status_scenario]
+
+        if self._max_episode_steps is not None:
+            dones = dones | (self._status_steps >= self._max_episode_steps)
+
+        return observations, rewards, dones, {}
+
+    def reset(self, mask=None):
+
+        # reset all environments if there's no mask of environments given
+        if mask is None:
+            mask = np.ones(self.num_envs, dtype=bool)
+
+        count = int(np.count_nonzero(mask))
+
+        # reset selected environments to random variables
+        self._status_route[mask] = self.np_random.integers(self.observation_space[0].n, size=count)
+        self._status_deviation[mask] = 0
+        self._status_scenario[mask] = self.np_random.integers(self.observation_space[2].n, size=count)
+        self._status_steps[mask] = 0
+
+        return self._get_observations(), {}
+
+    def _get_observations(self):
+        return np.stack([self._status_route, self._status_deviation, self._status_scenario], axis=1)
@@ -6,14 +6,54 @@ import numpy as np
 import pandas as pd
 
 from argparse import ArgumentParser
+from osmenv.presets import make_environment
+from osmenv.storage import Q_TABLE_EXTENSION
+from osmenv.storage import best_actions
+from osmenv.storage import is_binary_q_table
+from osmenv.storage import read_action_mask
+from osmenv.storage import read_q_table
 
 
-def generate_result_table(filename, inputs):
+def _action_mask(file, action_mask):
+
+    # binary q-tables carry the actions applicable to each route, JSON q-tables rely on the environment
+    if is_binary_q_table(file):
+        stored_action_mask = read_action_mask(file)
+        if stored_action_mask is not None:
+            return stored_action_mask
+
+    if action_mask is None:
+        raise RuntimeError('invalid q-table {0}, expected action mask of the environment'.format(file))
+
+    return action_mask
+
+
+def generate_result_table(filename, inputs, action_mask=None):
 
     writer = pd.ExcelWriter(filename, engine='xlsxwriter')
 
     for name, file in inputs.items():
 
+        # read binary q-table, only the no-deviation states are required
+        if is_binary_q_table(file):
+            q_table, _ = read_q_table(file)
+            num_routes, _, num_scenarios, _ = q_table.shape
+
+            mask = _action_mask(file, action_mask)
+
+            # fill results in schema: route, scenario => action to choose
+            df = pd.DataFrame({
+                'route': np.repeat(np.arange(num_routes), num_scenarios),
+                'scenario': np.tile(np.arange(num_scenarios), num_routes),
+                'action': best_actions(q_table[:, 0], mask).reshape(-1),
+            })
+
+            df.to_excel(writer, sheet_name=name, index=False)
+
+            continue
+
+        mask = _action_mask(file, action_mask)
+
         # read JSON data
         with open(file, 'r') as f:
             q_data = json.load(f)
@@ -27,7 +67,8 @@ def generate_result_table(filename, inputs):
             df = pd.DataFrame({
                 'route': [k[0] for k, v in q_table.items() if k[1] == 0],
                 'scenario': [k[2] for k, v in q_table.items() if k[1] == 0],
-                'action': [np.argmax(v) for k, v in q_table.items() if k[1] == 0],
+                'action': [int(best_actions(v[None, None], mask[k[0]][None])[0, 0])
+                           for k, v in q_table.items() if k[1] == 0],
             })
 
             df.to_excel(writer, sheet_name=name, index=False)
@@ -35,11 +76,37 @@ def generate_result_table(filename, inputs):
     writer.close()
 
 
-def print_result_table(filename):
+def _format_q_value(value, applicable):
+
+    # inapplicable actions are never chosen, thus their q values are meaningless
+    return locale.format('%.4f', value, 1) if applicable else '-'
+
+
+def print_result_table(filename, action_mask=None):
 
     # locale settings
     locale.setlocale(locale.LC_ALL, 'de')
 
+    # read binary q-table
+    if is_binary_q_table(filename):
+        q_table, _ = read_q_table(filename)
+        num_routes, _, num_scenarios, _ = q_table.shape
+
+        mask = _action_mask(filename, action_mask)
+
+        for r in range(num_routes):
+            for s in range(num_scenarios):
+
+                print('route: {0}, scenario: {1}'.format(r, s))
+                for action, applicable in zip(q_table[r, 0, s], mask[r]):
+                    print(_format_q_value(action, applicable))
+
+                print()
+
+        return
+
+    mask = _action_mask(filename, action_mask)
+
     # read JSON data
     with open(filename, 'r') as f:
         q_data = json.load(f)
@@ -53,8 +120,8 @@ def print_result_table(filename):
             if k[1] == 0:
 
                 print('route: {0}, scenario: {1}'.format(k[0], k[2]))
-                for action in v:
-                    print(locale.format('%.4f', action, 1))
+                for action, applicable in zip(v, mask[k[0]]):
+                    print(_format_q_value(action, applicable))
 
                 print()
 
@@ -65,9 +132,18 @@ if __name__ == '__main__':
     parser = ArgumentParser()
     parser.add_argument('-f', '--full', dest='env_full', action='store_true')
     parser.add_argument('-p', '--print', dest='print', action='store_true')
+    parser.add_argument('-b', '--binary', dest='binary', action='store_true')
 
     args = parser.parse_args()
 
+    # q-tables are either stored as JSON or binary file
+    extension = Q_TABLE_EXTENSION if args.binary else '.json'
+
+    # JSON q-tables don't carry the actions applicable to each route, thus they're taken from the environment
+    action_mask = None
+    if not args.binary:
+        action_mask = make_environment(args.env_full).unwrapped.action_mask
+
     # generate output file
     if args.env_full:
         filename = 'output/results-village.xlsx'
@@ -75,10 +151,10 @@ if __name__ == '__main__':
         filename = 'output/results.xlsx'
 
     generate_result_table(filename, {
-        'Q-Learning': 'output/q-learning.json',
-        'SARSA': 'output/ne-sarsa.json',
-        'Expected SARSA': 'output/ne-expected-sarsa.json',
-    })
+        'Q-Learning': 'output/q-learning' + extension,
+        'SARSA': 'output/ne-sarsa' + extension,
+        'Expected SARSA': 'output/ne-expected-sarsa' + extension,
+    }, action_mask)
 
     # print results for each file
     if args.print:
@@ -87,13 +163,13 @@ if __name__ == '__main__':
         np.core.arrayprint._line_width = 250
 
         print('Q-Learning')
-        print_result_table('output/q-learning.json')
+        print_result_table('output/q-learning' + extension, action_mask)
         print()
 
         print('SARSA')
-        print_result_table('output/ne-sarsa.json')
+        print_result_table('output/ne-sarsa' + extension, action_mask)
         print()
 
         print('Expected SARSA')
-        print_result_table('output/ne-expected-sarsa.json')
+        print_result_table('output/ne-expected-sarsa' + extension, action_mask)
         print()
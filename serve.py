@@ -0,0 +1,39 @@
+import asyncio
+
+from argparse import ArgumentParser
+from osmenv.service import RecommendationService
+from osmenv.service import run_load_test
+
+
+def print_reload_error(filename, error):
+    print('failed to reload {0}: {1}'.format(filename, error))
+
+
+if __name__ == '__main__':
+
+    # add options parser
+    parser = ArgumentParser()
+    parser.add_argument('-i', '--input', dest='input', default='output/q-learning.qtable')
+    parser.add_argument('-H', '--host', dest='host', default='127.0.0.1')
+    parser.add_argument('-p', '--port', dest='port', type=int, default=8765)
+    parser.add_argument('-w', '--watch', dest='watch', type=float, default=1.0)
+    parser.add_argument('-l', '--load-test', dest='load_test', action='store_true')
+    parser.add_argument('-n', '--requests', dest='requests', type=int, default=10000)
+    parser.add_argument('-c', '--concurrency', dest='concurrency', type=int, default=8)
+    parser.add_argument('-b', '--batch-size', dest='batch_size', type=int, default=1)
+
+    args = parser.parse_args()
+
+    # either run the service or a load test against a running service
+    if args.load_test:
+        result = asyncio.run(run_load_test(args.host, args.port, args.requests, args.concurrency, args.batch_size))
+
+        print('{requests} requests with {queries} queries in {duration:.3f}s, {throughput:.0f} queries/s, '
+              '{errors} errors'.format(**result))
+        print('latency p50={0:.1f}us, p99={1:.1f}us, max={2:.1f}us'.format(
+            result['p50'] * 1e6, result['p99'] * 1e6, result['max'] * 1e6))
+    else:
+        service = RecommendationService(args.input, args.watch, print_reload_error)
+
+        print('serving {0} on {1}:{2} ...'.format(args.input, args.host, args.port))
+        asyncio.run(service.serve_forever(args.host, args.port))
@@ -0,0 +1,151 @@
+import itertools
+import multiprocessing
+import time
+
+import numpy as np
+import pandas as pd
+
+from argparse import ArgumentParser
+from osmenv.qlearning import QLearning
+from osmenv.sarsa import Sarsa
+from osmenv.esarsa import ExpectedSarsa
+from osmenv.kernel import KernelExpectedSarsa
+from osmenv.kernel import KernelQLearning
+from osmenv.kernel import KernelSarsa
+from osmenv.kernel import NUMBA_AVAILABLE
+from osmenv.presets import make_environment
+
+ALGORITHMS = {
+    'q-learning': QLearning,
+    'sarsa': Sarsa,
+    'expected-sarsa': ExpectedSarsa
+}
+
+# same algorithms running whole episodes in the compiled training kernel
+KERNEL_ALGORITHMS = {
+    'q-learning': KernelQLearning,
+    'sarsa': KernelSarsa,
+    'expected-sarsa': KernelExpectedSarsa
+}
+
+# environment shared by all configurations of a worker process
+_env = None
+
+
+def _init_worker(env):
+
+    global _env
+    _env = env
+
+
+def evaluate(algorithm, env):
+
+    # mean reward of the greedy action chosen for each route and scenario
+    rewards = env.unwrapped.reward_table
+
+    return float(np.mean([
+        rewards[r, algorithm.predict((r, s)), s]
+        for r in range(rewards.shape[0])
+        for s in range(rewards.shape[2])
+    ]))
+
+
+def run_configuration(configuration):
+
+    name, kernel, episodes, gamma, epsilon, epsilon_decay, alpha, seed = configuration
+
+    # seed both random generators in order to make each configuration reproducible
+    np.random.seed(seed)
+    _env.seed(seed)
+
+    algorithms = KERNEL_ALGORITHMS if kernel else ALGORITHMS
+    algorithm = algorithms[name](_env, episodes, dense=True)
+
+    start = time.time()
+    count = algorithm.fit(gamma=gamma, epsilon=epsilon, epsilon_decay=epsilon_decay, alpha=alpha)
+    end = time.time()
+
+    return {
+        'algorithm': name,
+        'kernel': kernel,
+        'gamma': gamma,
+        'epsilon': epsilon,
+        'epsilon_decay': epsilon_decay,
+        'alpha': alpha,
+        'seed': seed,
+        'episodes': count,
+        'reward': evaluate(algorithm, _env),
+        'duration': end - start
+    }
+
+
+def run_sweep(env, configurations, processes=None):
+
+    # workers inherit the loaded environment when forked, elsewhere it is transferred once per worker
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+    else:
+        context = multiprocessing.get_context()
+
+    results = list()
+    with context.Pool(processes, initializer=_init_worker, initargs=(env,)) as pool:
+        for result in pool.imap_unordered(run_configuration, configurations):
+            print('{algorithm}: gamma={gamma}, epsilon={epsilon}, epsilon_decay={epsilon_decay}, '
+                  'alpha={alpha}, seed={seed} finished after {episodes} episodes'.format(**result))
+
+            results.append(result)
+
+    return pd.DataFrame(results).sort_values(['algorithm', 'gamma', 'epsilon', 'epsilon_decay', 'alpha', 'seed'])
+
+
+if __name__ == '__main__':
+
+    # add options parser
+    parser = ArgumentParser()
+    parser.add_argument('-a', '--algorithms', dest='algorithms', nargs='+', choices=ALGORITHMS.keys(),
+                        default=list(ALGORITHMS.keys()))
+    parser.add_argument('-g', '--gamma', dest='gamma', nargs='+', type=float, default=[0.95])
+    parser.add_argument('-e', '--epsilon', dest='epsilon', nargs='+', type=float, default=[0.5])
+    parser.add_argument('-d', '--epsilon-decay', dest='epsilon_decay', nargs='+', type=float, default=[0.999])
+    parser.add_argument('-l', '--alpha', dest='alpha', nargs='+', type=float, default=[0.8])
+    parser.add_argument('-s', '--seed', dest='seed', nargs='+', type=int, default=[0])
+    parser.add_argument('-n', '--episodes', dest='episodes', type=int, default=5000)
+    parser.add_argument('-p', '--processes', dest='processes', type=int, default=None)
+    parser.add_argument('-o', '--output', dest='output', default='output/sweep.csv')
+    parser.add_argument('-f', '--full', dest='env_full', action='store_true')
+    parser.add_argument('-c', '--catalog', dest='catalog', default=None)
+    parser.add_argument('-u', '--bundle', dest='bundle', default=None)
+    parser.add_argument('-k', '--kernel', dest='kernel', action='store_true')
+
+    args = parser.parse_args()
+
+    # without numba the kernel would run as plain Python, which is far slower than the regular algorithms
+    if args.kernel and not NUMBA_AVAILABLE:
+        parser.error('the kernel mode requires numba, see preq.txt')
+
+    # load simulation environment once for all workers
+    env = make_environment(args.env_full, catalog=args.catalog, bundle=args.bundle)
+
+    configurations = list(itertools.product(
+        args.algorithms,
+        [args.kernel],
+        [args.episodes],
+        args.gamma,
+        args.epsilon,
+        args.epsilon_decay,
+        args.alpha,
+        args.seed
+    ))
+
+    print('running {0} configurations ...'.format(len(configurations)))
+
+    df = run_sweep(env, configurations, args.processes)
+
+    # write result table
+    if args.output.endswith('.xlsx'):
+        df.to_excel(args.output, sheet_name='Sweep', index=False)
+    else:
+        df.to_csv(args.output, index=False)
+
+    print()
+    print(df.to_string(index=False))